@@ -0,0 +1,307 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jpestat_client import JPEStatClient, JPEStatData, concat_stat_data_json
+
+'''
+JPEStatClient → JPEStatData → DataFrameの処理全体のベンチマーク
+e-Statの代わりにローカルのHTTPサーバを起動し、合成した(または記録した)getStatsList、getMetaInfo、getStatsDataの
+レスポンスを返す。JPESTAT_APP_IDは不要
+計測項目
+  - getMetaInfo、getStatsListのリクエスト数/秒とレイテンシのパーセンタイル
+  - 統計データのサイズ(セル数)ごとの取得時間(HTTP + JSONデコード)、DataFrame変換時間、ピークRSS
+'''
+
+# 合成した統計表のIDの接頭辞。bench_<セル数> (例: bench_1000000)
+SYNTHETIC_ID_PREFIX = "bench_"
+# 合成した統計表の分類事項のコード数。地域(area)のコード数はセル数に合わせて決める
+_CAT01_SIZE = 10
+_TIME_SIZE = 10
+# 合成した統計表情報の件数
+_STAT_LIST_SIZE = 1000
+# getStatsDataのlimitの既定値 (e-Statの上限と同じ)
+_DEFAULT_LIMIT = 100_000
+
+# 合成した統計表のCLASS_INFを作成する
+def _make_class_inf(cells: int) -> dict:
+    area_size = max(1, math.ceil(cells / (_CAT01_SIZE * _TIME_SIZE)))
+    return {"CLASS_OBJ": [
+        {"@id": "tab", "@name": "表章項目", "CLASS": {"@code": "001", "@name": "人口", "@level": "", "@unit": "人"}},
+        {"@id": "cat01", "@name": "分類", "CLASS": [
+            {"@code": f"{i:03d}", "@name": f"分類{i}", "@level": "1"} for i in range(_CAT01_SIZE)]},
+        {"@id": "area", "@name": "地域", "CLASS": [
+            {"@code": f"{i:05d}", "@name": f"地域{i}", "@level": "2", "@parentCode": "00000"} for i in range(area_size)]},
+        {"@id": "time", "@name": "時間軸", "CLASS": [
+            {"@code": f"{2000 + i}000000", "@name": f"{2000 + i}年", "@level": "1"} for i in range(_TIME_SIZE)]},
+    ]}
+
+# 合成した統計表のVALUEを作成する。start(1始まり)からn件
+def _make_values(start: int, n: int) -> list[dict]:
+    values = []
+    for i in range(start - 1, start - 1 + n):
+        values.append({
+            "@tab": "001",
+            "@cat01": f"{(i // _TIME_SIZE) % _CAT01_SIZE:03d}",
+            "@area": f"{i // (_TIME_SIZE * _CAT01_SIZE):05d}",
+            "@time": f"{2000 + i % _TIME_SIZE}000000",
+            "@unit": "人",
+            "$": "-" if i % 50 == 0 else str(i * 7 % 1_000_003),
+        })
+    return values
+
+def _make_table_inf(stats_data_id: str) -> dict:
+    return {
+        "@id": stats_data_id,
+        "STAT_NAME": {"@code": "00000000", "$": "ベンチマーク用統計"},
+        "GOV_ORG": {"@code": "00000", "$": "ベンチマーク"},
+        "STATISTICS_NAME": "ベンチマーク用統計",
+        "TITLE": {"@no": "1", "$": f"合成統計表 {stats_data_id}"},
+        "CYCLE": "年次",
+        "SURVEY_DATE": "202001",
+        "COLLECT_AREA": "全国",
+        "UPDATED_DATE": "2020-01-01",
+        "DESCRIPTION": "",
+        "TITLE_SPEC": {"TABLE_CATEGORY": "ベンチマーク", "TABLE_NAME": f"合成統計表 {stats_data_id}", "TABLE_EXPLANATION": ""},
+    }
+
+def _get_cells(stats_data_id: str) -> int:
+    if not stats_data_id.startswith(SYNTHETIC_ID_PREFIX):
+        raise ValueError(f"unknown statsDataId: {stats_data_id}")
+    return int(stats_data_id[len(SYNTHETIC_ID_PREFIX):])
+
+# 合成したレスポンスを作成する
+def make_synthetic_response(endpoint: str, params: dict) -> dict:
+    result = {"STATUS": 0, "ERROR_MSG": "正常に終了しました。", "DATE": "2020-01-01T00:00:00.000+09:00"}
+    start = int(params.get("startPosition", 1))
+    if endpoint == "getStatsList":
+        limit = int(params.get("limit", _STAT_LIST_SIZE))
+        n = max(0, min(limit, _STAT_LIST_SIZE - start + 1))
+        result_inf = {"FROM_NUMBER": start, "TO_NUMBER": start + n - 1}
+        if start + n <= _STAT_LIST_SIZE:
+            result_inf["NEXT_KEY"] = start + n
+        return {"GET_STATS_LIST": {"RESULT": result, "PARAMETER": params, "DATALIST_INF": {
+            "NUMBER": _STAT_LIST_SIZE, "RESULT_INF": result_inf,
+            "TABLE_INF": [_make_table_inf(f"{SYNTHETIC_ID_PREFIX}{i}") for i in range(start, start + n)]}}}
+
+    stats_data_id = params.get("statsDataId", "")
+    cells = _get_cells(stats_data_id)
+    if endpoint == "getMetaInfo":
+        return {"GET_META_INFO": {"RESULT": result, "PARAMETER": params, "METADATA_INF": {
+            "TABLE_INF": _make_table_inf(stats_data_id), "CLASS_INF": _make_class_inf(cells)}}}
+    if endpoint == "getStatsData":
+        limit = int(params.get("limit", _DEFAULT_LIMIT))
+        n = max(0, min(limit, cells - start + 1))
+        result_inf = {"TOTAL_NUMBER": cells, "FROM_NUMBER": start, "TO_NUMBER": start + n - 1}
+        if start + n <= cells:
+            result_inf["NEXT_KEY"] = start + n
+        statistical_data = {"RESULT_INF": result_inf, "TABLE_INF": _make_table_inf(stats_data_id)}
+        if params.get("cntGetFlg") != "Y":
+            statistical_data["CLASS_INF"] = _make_class_inf(cells)
+            statistical_data["DATA_INF"] = {"VALUE": _make_values(start, n)}
+        return {"GET_STATS_DATA": {"RESULT": result, "PARAMETER": params, "STATISTICAL_DATA": statistical_data}}
+    raise ValueError(f"unknown endpoint: {endpoint}")
+
+def get_response_body(endpoint: str, params: dict, fixture_dir: str | None = None) -> bytes:
+    """
+    レスポンスのJSON(バイト列)を返す
+    fixture_dirを指定した場合、記録したレスポンスを次の順に探して返す。見つからない場合は合成したレスポンスを返す
+      <fixture_dir>/<API名>.<statsDataId>.<startPosition>.json
+      <fixture_dir>/<API名>.<statsDataId>.json
+      <fixture_dir>/<API名>.json
+    """
+    if fixture_dir is not None:
+        stats_data_id = params.get("statsDataId")
+        names = [f"{endpoint}.json"]
+        if stats_data_id:
+            names[:0] = [f"{endpoint}.{stats_data_id}.{params.get('startPosition', 1)}.json", f"{endpoint}.{stats_data_id}.json"]
+        for name in names:
+            path = os.path.join(fixture_dir, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+    return json.dumps(make_synthetic_response(endpoint, params), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# サーバプロセスのエントリポイント。待ち受けたポート番号をconnで返す
+def _serve(fixture_dir: str | None, host: str, port: int, conn):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-aliveで接続を再利用する
+        protocol_version = "HTTP/1.1"
+        # ヘッダと本文を別々に送信するため、Nagleアルゴリズムによる遅延を避ける
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            endpoint = url.path.rsplit("/", 1)[-1]
+            try:
+                body = get_response_body(endpoint, params, fixture_dir)
+            except ValueError as e:
+                body = json.dumps({"RESULT": {"STATUS": 100, "ERROR_MSG": str(e)}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    conn.send(server.server_address[1])
+    conn.close()
+    server.serve_forever()
+
+class BenchmarkServer:
+    """
+    e-Stat APIの代わりにレスポンスを返すローカルのHTTPサーバ
+    クライアントとGILを奪い合わないよう、別プロセスで起動する
+    fixture_dir: 記録したレスポンスのディレクトリ (get_response_body参照)
+    """
+    def __init__(self, fixture_dir: str | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.fixture_dir = fixture_dir
+        self.host = host
+        self.port = port
+        self._process: multiprocessing.process.BaseProcess | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/rest/3.0/app"
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        self._process = context.Process(target=_serve, args=(self.fixture_dir, self.host, self.port, child_conn), daemon=True)
+        self._process.start()
+        self.port = parent_conn.recv()
+        parent_conn.close()
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+# ピークRSS(MiB)を返す
+def get_peak_rss() -> float:
+    # Linuxのru_maxrssはKiB単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# レイテンシ(秒)のリストを集計する
+def summarize_latency(latencies: list[float], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) >= 2 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p90_ms": quantiles[89] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+def bench_requests(base_url: str, endpoint: str, requests_count: int, concurrency: int) -> dict:
+    """
+    小さいレスポンスのAPIをconcurrency個のスレッドで呼び出し、リクエスト数/秒とレイテンシを計測する
+    """
+    with JPEStatClient(app_id="bench", base_url=base_url, pool_size=concurrency, coalesce_requests=False) as client:
+        if endpoint == "getMetaInfo":
+            def call(i: int) -> float:
+                start = time.perf_counter()
+                client.get_meta_info_json(params={"statsDataId": f"{SYNTHETIC_ID_PREFIX}{1000 + i}"})
+                return time.perf_counter() - start
+        else:
+            def call(i: int) -> float:
+                start = time.perf_counter()
+                client.get_stat_list_json(params={"startPosition": i % _STAT_LIST_SIZE + 1, "limit": 100})
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(call, range(requests_count)))
+        elapsed = time.perf_counter() - start
+    return summarize_latency(latencies, elapsed)
+
+def bench_stat_data(base_url: str, stats_data_id: str, limit: int, low_memory: bool) -> dict:
+    """
+    統計データを全ページ取得してDataFrameに変換し、取得時間、変換時間、ピークRSSを計測する
+    low_memory=Falseの場合、取得時間はHTTP + JSONデコード、変換時間はページの結合 + get_value_df
+    low_memory=Trueの場合はストリーミングで取得と変換を同時に行うため、合計時間のみ計測する
+    ピークRSSを統計表ごとに計測するため、別プロセスで実行する
+    """
+    params = {"statsDataId": stats_data_id, "limit": limit}
+    with JPEStatClient(app_id="bench", base_url=base_url, coalesce_requests=False) as client:
+        start = time.perf_counter()
+        if low_memory:
+            value_df = client.get_stat_data_all_object(params=params, low_memory=True).get_value_df()
+            fetch_time = time.perf_counter() - start
+            parse_time = 0.0
+            pages = math.ceil(len(value_df) / limit)
+        else:
+            page_list = list(client.iter_stat_data_json(params=params))
+            fetch_time = time.perf_counter() - start
+            start = time.perf_counter()
+            pages = len(page_list)
+            stat_data_object = JPEStatData(stats_data_id=stats_data_id, stat_data=concat_stat_data_json(page_list))
+            del page_list
+            value_df = stat_data_object.get_value_df()
+            parse_time = time.perf_counter() - start
+    return {
+        "rows": len(value_df),
+        "pages": pages,
+        "fetch_s": fetch_time,
+        "parse_s": parse_time,
+        "total_s": fetch_time + parse_time,
+        "peak_rss_mib": get_peak_rss(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JPEStatClientの取得～DataFrame変換のベンチマーク")
+    parser.add_argument("--cells", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="合成する統計データのセル数 (例: 10000 100000 1000000 5000000)")
+    parser.add_argument("--stats-data-id", nargs="+", default=[],
+                        help="記録したレスポンスの統計表ID (--fixture-dirと併用)")
+    parser.add_argument("--fixture-dir", help="記録したレスポンスのディレクトリ")
+    parser.add_argument("--limit", type=int, default=_DEFAULT_LIMIT, help="getStatsDataの1ページの件数")
+    parser.add_argument("--low-memory", action="store_true", help="ストリーミング(low_memory=True)でも計測する")
+    parser.add_argument("--requests", type=int, default=500, help="getMetaInfo、getStatsListのリクエスト数")
+    parser.add_argument("--concurrency", type=int, default=8, help="getMetaInfo、getStatsListの同時リクエスト数")
+    args = parser.parse_args()
+
+    stats_data_ids = [f"{SYNTHETIC_ID_PREFIX}{cells}" for cells in args.cells] + args.stats_data_id
+    with BenchmarkServer(fixture_dir=args.fixture_dir) as server:
+        print(f"{'endpoint':<14} {'requests':>8} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for endpoint in ("getMetaInfo", "getStatsList"):
+            result = bench_requests(server.base_url, endpoint, args.requests, args.concurrency)
+            print(f"{endpoint:<14} {result['requests']:>8} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} "
+                  f"{result['p90_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['max_ms']:>8.2f}")
+        print()
+
+        print(f"{'statsDataId':<16} {'mode':<10} {'rows':>9} {'pages':>5} {'fetch s':>8} {'parse s':>8} {'total s':>8} {'rows/s':>10} {'peak RSS MiB':>12}")
+        modes = [False, True] if args.low_memory else [False]
+        # ピークRSSが前の計測の影響を受けないよう、1回ごとに新しいプロセスで実行する
+        context = multiprocessing.get_context("spawn")
+        for stats_data_id in stats_data_ids:
+            for low_memory in modes:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(bench_stat_data, server.base_url, stats_data_id, args.limit, low_memory).result()
+                mode = "low_memory" if low_memory else "json"
+                print(f"{stats_data_id:<16} {mode:<10} {result['rows']:>9} {result['pages']:>5} {result['fetch_s']:>8.3f} "
+                      f"{result['parse_s']:>8.3f} {result['total_s']:>8.3f} {result['rows'] / result['total_s']:>10.0f} "
+                      f"{result['peak_rss_mib']:>12.1f}")
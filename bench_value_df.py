@@ -0,0 +1,63 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import pandas as pd # type: ignore[import]
+
+from jpestat_client import decode_value_list
+
+'''
+JPEStatData.get_value_dfのVALUE変換のベンチマーク
+従来のpd.json_normalizeによる変換とdecode_value_listによる変換の処理時間、ピークメモリを比較する
+'''
+
+# 合成したVALUE(dictのlist)を作成する
+def make_values(rows: int) -> list[dict]:
+    rng = random.Random(0)
+    specials = ["-", "…", "***", "X"]
+    values = []
+    for i in range(rows):
+        value = specials[i % 4] if rng.random() < 0.05 else str(rng.randint(0, 10_000_000))
+        values.append({
+            "@tab": "020",
+            "@cat01": f"{i % 20:03d}",
+            "@cat02": f"{i % 3:02d}",
+            "@area": f"{(i // 60) % 1900 + 1000:05d}",
+            "@time": f"{2000 + (i // 114000) % 25}000000",
+            "@unit": "人",
+            "$": value,
+        })
+    return values
+
+# 関数の処理時間(秒)とピークメモリ(バイト)を計測する
+def measure(func, values: list[dict], repeat: int) -> tuple[float, int]:
+    # tracemallocは処理時間に影響するため、処理時間とピークメモリは別々に計測する
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = func(values)
+        elapsed.append(time.perf_counter() - start)
+        del df
+    tracemalloc.start()
+    df = func(values)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del df
+    return min(elapsed), peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VALUE変換のベンチマーク")
+    parser.add_argument("--rows", type=int, default=500_000, help="VALUEの行数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数(最小値を採用)")
+    args = parser.parse_args()
+
+    values = make_values(args.rows)
+    results = {
+        "json_normalize": measure(pd.json_normalize, values, args.repeat),
+        "decode_value_list": measure(decode_value_list, values, args.repeat),
+    }
+    base_time, base_peak = results["json_normalize"]
+    print(f"rows: {args.rows}")
+    for name, (elapsed, peak) in results.items():
+        print(f"{name:>18}: {elapsed:8.3f} s ({base_time / elapsed:5.1f}x)  peak {peak / 1024 / 1024:8.1f} MiB ({base_peak / peak:5.1f}x)")
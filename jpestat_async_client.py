@@ -0,0 +1,238 @@
+import asyncio
+import json
+from typing import AsyncIterator, Iterable
+
+import aiohttp # type: ignore[import]
+
+from jpestat_client import (
+    JPEStatClient, JPEStatData, JPEStatListData, JPEStatMetaData,
+    _get_backoff, _get_stat_data_next_key, _get_stat_list_next_key,
+    concat_stat_data_json, concat_stat_list_json,
+)
+
+'''
+日本の政府統計APIを非同期(asyncio)で利用するためのクライアントクラス
+多数の統計表を同時に取得する用途向け
+'''
+
+class AsyncJPEStatClient:
+    # e-Stat API(バージョン3.0)のベースURL
+    BASE_URL = JPEStatClient.BASE_URL
+    # リトライ対象のHTTPステータスコード
+    RETRY_STATUS_CODES = JPEStatClient.RETRY_STATUS_CODES
+
+    def __init__(self, app_id: str, lang: str = "J",
+                 base_url: str = BASE_URL,
+                 pool_size: int = 100,
+                 connect_timeout: float = 10.0,
+                 read_timeout: float = 120.0,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 backoff_max: float = 30.0,
+                 session: aiohttp.ClientSession | None = None):
+        """
+        3.1. 全API共通
+        パラメータ、通信設定はJPEStatClientと同様
+        pool_size: 同時接続数の上限
+        session: 利用するaiohttp.ClientSession。省略時は最初のリクエスト時に作成する
+        """
+        self.app_id = app_id
+        self.lang = lang
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.session = session
+
+    async def close(self):
+        """
+        Sessionを閉じてコネクションプールを解放する
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    # 呼び出し元のparamsを変更せずに、全API共通のパラメータを付与したパラメータを作成する
+    def _build_params(self, params: dict) -> dict:
+        request_params = {key: str(value) for key, value in params.items()}
+        request_params["appId"] = self.app_id
+        request_params["lang"] = self.lang
+        return request_params
+
+    # APIを呼び出してJSONをdictで返す
+    async def _get_json(self, path: str, params: dict) -> dict:
+        """
+        5xxエラー、タイムアウト、接続エラーの場合はmax_retries回までリトライする
+        path: ベースURLからの相対パス (例: json/getStatsData)
+        """
+        url = f"{self.base_url}/{path}"
+        request_params = self._build_params(params)
+        session = self._get_session()
+        attempt = 0
+        while True:
+            try:
+                async with session.get(url, params=request_params) as response:
+                    if response.status == 200:
+                        return json.loads(await response.read())
+                    if response.status not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        response.raise_for_status()
+                        raise Exception(f"Unexpected status code: {response.status}")
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                if attempt >= self.max_retries:
+                    raise
+            await asyncio.sleep(_get_backoff(attempt, self.backoff_factor, self.backoff_max))
+            attempt += 1
+
+    # 2 統計表情報取得
+    async def get_stat_list_json(self, params: dict ={}) -> dict:
+        """
+        3.2. 統計表情報取得
+        パラメータはJPEStatClient.get_stat_list_jsonと同様
+        """
+        return await self._get_json("json/getStatsList", params=params)
+
+    # 統計表データを取得してJPEStatListDataクラスを返す
+    async def get_stat_list_object(self, params: dict ={}) -> JPEStatListData:
+        """
+        3.2. 統計表情報取得
+        """
+        stat_list = await self.get_stat_list_json(params=params)
+        return JPEStatListData(stat_list=stat_list)
+
+    # 統計表情報をNEXT_KEYに従ってページ単位で取得する
+    async def iter_stat_list_json(self, params: dict ={}) -> AsyncIterator[dict]:
+        """
+        3.2. 統計表情報取得
+        RESULT_INF.NEXT_KEYをstartPositionに指定して継続データを順に取得し、1ページ分のdictをyieldする
+        """
+        page_params = dict(params)
+        while True:
+            stat_list = await self.get_stat_list_json(params=page_params)
+            next_key = _get_stat_list_next_key(stat_list)
+            yield stat_list
+            if not next_key:
+                break
+            page_params["startPosition"] = next_key
+
+    # 統計表情報を全件取得してJPEStatListDataクラスを返す
+    async def get_stat_list_all_object(self, params: dict ={}) -> JPEStatListData:
+        """
+        3.2. 統計表情報取得
+        継続データを含めて全件を取得し、1つのJPEStatListDataに結合する
+        """
+        pages = [stat_list async for stat_list in self.iter_stat_list_json(params=params)]
+        return JPEStatListData(stat_list=concat_stat_list_json(pages))
+
+    # 3 メタ情報取得
+    async def get_meta_info_json(self, params: dict ={}) -> dict:
+        """
+        3.3. メタ情報取得
+        パラメータはJPEStatClient.get_meta_info_jsonと同様
+        """
+        return await self._get_json("json/getMetaInfo", params=params)
+
+    # メタ情報を取得してJPEStatMetaDataクラスを返す
+    async def get_meta_info_object(self, params: dict ={}) -> JPEStatMetaData:
+        """
+        3.3. メタ情報取得
+        """
+        meta_info = await self.get_meta_info_json(params=params)
+        return JPEStatMetaData(meta_data=meta_info)
+
+    # 4 統計データ取得
+    async def get_stat_data_json(self, params: dict ={}) -> dict:
+        """
+        3.4. 統計データ取得
+        パラメータはJPEStatClient.get_stat_data_jsonと同様
+        """
+        return await self._get_json("json/getStatsData", params=params)
+
+    # 統計データを取得してJPEStatDataクラスを返す
+    async def get_stat_data_object(self, params: dict ={}) -> JPEStatData:
+        """
+        3.4. 統計データ取得
+        """
+        stat_data = await self.get_stat_data_json(params=params)
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data)
+
+    # 統計データをNEXT_KEYに従ってページ単位で取得する
+    async def iter_stat_data_json(self, params: dict ={}) -> AsyncIterator[dict]:
+        """
+        3.4. 統計データ取得
+        RESULT_INF.NEXT_KEYをstartPositionに指定して継続データを順に取得し、1ページ分のdictをyieldする
+        """
+        page_params = dict(params)
+        while True:
+            stat_data = await self.get_stat_data_json(params=page_params)
+            next_key = _get_stat_data_next_key(stat_data)
+            yield stat_data
+            if not next_key:
+                break
+            page_params["startPosition"] = next_key
+
+    # 統計データを全件取得してJPEStatDataクラスを返す
+    async def get_stat_data_all_object(self, params: dict ={}) -> JPEStatData:
+        """
+        3.4. 統計データ取得
+        継続データを含めて全件を取得し、1つのJPEStatDataに結合する
+        """
+        pages = [stat_data async for stat_data in self.iter_stat_data_json(params=params)]
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=concat_stat_data_json(pages))
+
+    # 同時実行数を制限して統計データを取得するタスクを作成する
+    def _create_stat_data_tasks(self, stats_data_ids: Iterable[str], params: dict, concurrency: int) -> list[asyncio.Task]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(stats_data_id: str) -> JPEStatData:
+            async with semaphore:
+                return await self.get_stat_data_all_object(params=dict(params, statsDataId=stats_data_id))
+
+        return [asyncio.create_task(fetch(stats_data_id)) for stats_data_id in stats_data_ids]
+
+    # 複数の統計表の統計データを並行して取得する
+    async def gather_stat_data(self, stats_data_ids: Iterable[str], params: dict ={}, concurrency: int = 10,
+                               return_exceptions: bool = False) -> list:
+        """
+        3.4. 統計データ取得
+        stats_data_idsの各統計表IDについて、継続データを含めて全件を取得する
+        stats_data_ids: 統計表IDのリスト
+        params: 全統計表に共通のパラメータ (statsDataIdは各統計表IDで上書きする)
+        concurrency: 同時に取得する統計表数の上限。各統計表のページは順に取得するため、同時リクエスト数の上限にもなる
+        return_exceptions: Trueの場合、失敗した統計表は例外オブジェクトを結果に格納する
+        戻り値: stats_data_idsと同じ順序のJPEStatDataのリスト
+        """
+        tasks = self._create_stat_data_tasks(stats_data_ids, params, concurrency)
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # 複数の統計表の統計データを並行して取得し、取得が完了した順に返す
+    async def iter_stat_data_as_completed(self, stats_data_ids: Iterable[str], params: dict ={},
+                                          concurrency: int = 10) -> AsyncIterator[JPEStatData]:
+        """
+        3.4. 統計データ取得
+        gather_stat_dataと同様に取得し、取得が完了した統計表から順にJPEStatDataをyieldする
+        """
+        tasks = self._create_stat_data_tasks(stats_data_ids, params, concurrency)
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
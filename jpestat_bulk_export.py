@@ -0,0 +1,266 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import pandas as pd # type: ignore[import]
+
+from jpestat_cache import make_request_key
+from jpestat_client import JPEStatClient, JPEStatData, _get_result_status, concat_stat_data_json, init_env
+
+'''
+日本の政府統計APIの統計データを一括でファイルに出力するコマンド
+ジョブの一覧(JSON Lines形式のマニフェスト)の統計表を順に取得し、JSONからDataFrameへの変換とファイルの書き込みを
+プロセスプールで並行に行う。完了したジョブはチェックポイントファイルに記録し、再実行時は完了済みのジョブを飛ばす
+(paramsを変更したジョブは再度実行する)
+
+マニフェストの各行
+  {"statsDataId": "0003448237", "params": {"cdArea": "13000"}, "id": "tokyo", "output": "tokyo.csv"}
+  statsDataId以外は省略可
+  id: ジョブID。省略時はstatsDataId(paramsを指定した場合はstatsDataIdとparamsのハッシュ)
+  output: 出力ファイル名(出力ディレクトリからの相対パス)。省略時は「ジョブID.形式」
+          拡張子が.csvまたは.parquetの場合は、その形式で出力する
+'''
+
+# 出力形式と拡張子
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+def load_manifest(path: str) -> list[dict]:
+    """
+    マニフェストを読み込み、ジョブ(id, statsDataId, params, output)のリストを返す
+    空行は無視する。ジョブIDが重複している場合はValueError
+    """
+    jobs = []
+    job_ids = set()
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            stats_data_id = entry.get("statsDataId")
+            if not stats_data_id:
+                raise ValueError(f"{path}:{line_no}: statsDataId is required.")
+            params = dict(entry.get("params", {}))
+            params.pop("statsDataId", None)
+            job_id = entry.get("id")
+            if not job_id:
+                job_id = stats_data_id if not params else f"{stats_data_id}-{make_request_key('getStatsData', params)[:12]}"
+            if job_id in job_ids:
+                raise ValueError(f"{path}:{line_no}: duplicate job id: {job_id}")
+            job_ids.add(job_id)
+            jobs.append({"id": job_id, "statsDataId": stats_data_id, "params": params, "output": entry.get("output")})
+    return jobs
+
+def _write_atomic(df: pd.DataFrame, path: str, data_format: str):
+    """
+    一時ファイルに書き込んでfsyncした後に置き換え、途中で中断しても不完全なファイルが残らないようにする
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        if data_format == "parquet":
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_csv(tmp_path, index=False, encoding="utf-8")
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def convert_pages(stats_data_id: str, pages: list[bytes], path: str, data_format: str = "csv", labels: bool = False) -> int:
+    """
+    統計データのJSON(バイト列)のページをDataFrameに変換してファイルに書き込み、行数を返す
+    プロセスプールのワーカーで実行する
+    labels: Trueの場合、列名とコードをCLASS_INFの名称に置き換える (get_column_modified_values_df)
+    """
+    page_list = []
+    for content in pages:
+        page = json.loads(content)
+        if _get_result_status(page) >= 100:
+            result = page.get("GET_STATS_DATA",{}).get("RESULT",{})
+            raise Exception(f"{stats_data_id}: {result.get('STATUS')} {result.get('ERROR_MSG')}")
+        page_list.append(page)
+    del pages
+    stat_data_object = JPEStatData(stats_data_id=stats_data_id, stat_data=concat_stat_data_json(page_list))
+    del page_list
+    if labels:
+        df = stat_data_object.get_column_modified_values_df(decode_labels=True)
+    else:
+        df = stat_data_object.get_value_df()
+    _write_atomic(df, path, data_format)
+    return len(df)
+
+class JPEStatBulkExporter:
+    """
+    統計データの一括出力クラス
+    取得はメインプロセスでJPEStatClient.iter_stat_data_rawを使用して順に行い(レート制限、リトライ、hooksはclientの設定に従う。
+    JSONを変換せずに受け渡すため、キャッシュと同時リクエストの集約は使用しない)、
+    CPU負荷の高いJSONからDataFrameへの変換はプロセスプールで行う
+    """
+    def __init__(self, client: JPEStatClient, output_dir: str,
+                 checkpoint_path: str | None = None,
+                 max_workers: int | None = None,
+                 data_format: str = "csv",
+                 labels: bool = False):
+        """
+        output_dir: 出力ディレクトリ
+        checkpoint_path: 完了したジョブを記録するJSON Linesファイル。省略時は出力ディレクトリのcheckpoint.jsonl
+        max_workers: 変換を行うプロセス数。省略時はCPU数
+        data_format: 出力形式 (csv または parquet)
+        labels: Trueの場合、列名とコードをCLASS_INFの名称に置き換えて出力する
+        """
+        if data_format not in OUTPUT_FORMATS:
+            raise ValueError(f"data_format must be one of {list(OUTPUT_FORMATS)}.")
+        self.client = client
+        self.output_dir = output_dir
+        self.checkpoint_path = checkpoint_path or os.path.join(output_dir, "checkpoint.jsonl")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.data_format = data_format
+        self.labels = labels
+        os.makedirs(output_dir, exist_ok=True)
+
+    def get_output_path(self, job: dict) -> str:
+        """
+        ジョブの出力ファイルのパスを返す
+        """
+        output = job.get("output") or f"{job['id']}{OUTPUT_FORMATS[self.data_format]}"
+        return os.path.join(self.output_dir, output)
+
+    def get_output_format(self, job: dict) -> str:
+        """
+        ジョブの出力形式を返す。出力ファイル名の拡張子が出力形式に対応する場合はその形式
+        """
+        extension = os.path.splitext(job.get("output") or "")[1].lower()
+        for data_format, format_extension in OUTPUT_FORMATS.items():
+            if extension == format_extension:
+                return data_format
+        return self.data_format
+
+    def load_checkpoint(self) -> dict:
+        """
+        チェックポイントファイルから完了したジョブをジョブIDをキーとするdictで返す
+        書き込み途中で中断した最終行は無視する
+        """
+        finished: dict = {}
+        if not os.path.exists(self.checkpoint_path):
+            return finished
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                finished[record["id"]] = record
+        return finished
+
+    # 書き込み途中で中断した最終行を削除し、以降の追記が壊れた行に連結されないようにする
+    def _repair_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, "rb+") as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                f.truncate(content.rfind(b"\n") + 1)
+                f.flush()
+                os.fsync(f.fileno())
+
+    # 完了したジョブをチェックポイントファイルに追記する
+    def _write_checkpoint(self, record: dict):
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ジョブの取得パラメータのハッシュ。チェックポイントに記録し、マニフェストのparamsの変更を検出する
+    def _get_params_key(self, job: dict) -> str:
+        return make_request_key("getStatsData", dict(job["params"], statsDataId=job["statsDataId"]))
+
+    # 未完了のジョブを返す
+    # チェックポイントに記録されていても、出力ファイルがない場合、paramsが変更された場合は再実行する
+    def get_pending_jobs(self, jobs: list[dict]) -> list[dict]:
+        self._repair_checkpoint()
+        finished = self.load_checkpoint()
+        return [job for job in jobs
+                if job["id"] not in finished
+                or finished[job["id"]].get("params_key") != self._get_params_key(job)
+                or not os.path.exists(self.get_output_path(job))]
+
+    def run(self, jobs: list[dict]) -> dict:
+        """
+        未完了のジョブを実行する
+        失敗したジョブはチェックポイントに記録せず、残りのジョブを続行する(再実行時に再度実行される)
+        取得済みで変換待ちのジョブはmax_workers個までとし、メモリ使用量を抑える
+        戻り値: {"skipped": 完了済みで飛ばした件数, "finished": 完了した件数, "failed": {ジョブID: エラーメッセージ}}
+        """
+        pending = self.get_pending_jobs(jobs)
+        summary: dict = {"skipped": len(jobs) - len(pending), "finished": 0, "failed": {}}
+        futures: dict[Future, dict] = {}
+
+        def collect(done):
+            for future in done:
+                job = futures.pop(future)
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    summary["failed"][job["id"]] = str(e)
+                    continue
+                self._write_checkpoint({
+                    "id": job["id"],
+                    "statsDataId": job["statsDataId"],
+                    "params_key": self._get_params_key(job),
+                    "output": os.path.relpath(self.get_output_path(job), self.output_dir),
+                    "rows": rows,
+                    "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                })
+                summary["finished"] += 1
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for job in pending:
+                params = dict(job["params"], statsDataId=job["statsDataId"])
+                try:
+                    pages = list(self.client.iter_stat_data_raw(params=params))
+                except Exception as e:
+                    summary["failed"][job["id"]] = str(e)
+                    continue
+                future = executor.submit(convert_pages, job["statsDataId"], pages, self.get_output_path(job),
+                                         self.get_output_format(job), self.labels)
+                futures[future] = job
+                del pages
+                if len(futures) >= self.max_workers:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    collect(done)
+            done, _ = wait(futures)
+            collect(done)
+        return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="e-Stat統計データの一括出力")
+    parser.add_argument("manifest", help="ジョブの一覧 (JSON Lines形式)")
+    parser.add_argument("--output-dir", default="jpestat_export", help="出力ディレクトリ")
+    parser.add_argument("--checkpoint", help="チェックポイントファイル (省略時は出力ディレクトリのcheckpoint.jsonl)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="csv", help="出力形式")
+    parser.add_argument("--labels", action="store_true", help="列名とコードを名称に置き換えて出力する")
+    parser.add_argument("--workers", type=int, help="変換を行うプロセス数 (省略時はCPU数)")
+    args = parser.parse_args()
+
+    init_env()
+    app_id = os.getenv("JPESTAT_APP_ID", "")
+    if not app_id:
+        raise ValueError("JPESTAT_APP_ID is not set in the environment variables.")
+    jobs = load_manifest(args.manifest)
+    with JPEStatClient(app_id=app_id, lang="J") as client:
+        exporter = JPEStatBulkExporter(client, args.output_dir, checkpoint_path=args.checkpoint,
+                                       max_workers=args.workers, data_format=args.format, labels=args.labels)
+        summary = exporter.run(jobs)
+    for job_id, error in summary["failed"].items():
+        print(f"failed: {job_id}: {error}", file=sys.stderr)
+    print(f"finished: {summary['finished']}, skipped: {summary['skipped']}, failed: {len(summary['failed'])}")
+    if summary["failed"]:
+        sys.exit(1)
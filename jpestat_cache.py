@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+'''
+日本の政府統計APIのレスポンスをディスクにキャッシュするクラス
+JPEStatClientのcache引数に指定して利用する
+'''
+
+# キャッシュキーに含めないパラメータ
+_IGNORED_PARAMS = ("appId", "callback")
+
+def make_request_key(endpoint: str, params: dict) -> str:
+    """
+    エンドポイントとパラメータからリクエストを一意に識別するキーを作成する
+    appIdは利用者ごとに異なるだけでレスポンスに影響しないため除外する
+    パラメータの順序、値の型(1と"1")の違いは同一とみなす
+    """
+    normalized = {str(key): str(value) for key, value in params.items() if key not in _IGNORED_PARAMS}
+    text = json.dumps([endpoint, sorted(normalized.items())], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def get_updated_date(endpoint: str, data: dict) -> str | None:
+    """
+    レスポンスのTABLE_INF.UPDATED_DATE(最終更新日)を取得する。存在しない場合はNone
+    """
+    if endpoint == "getStatsData":
+        table_inf = data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("TABLE_INF",{})
+    elif endpoint == "getMetaInfo":
+        table_inf = data.get("GET_META_INFO",{}).get("METADATA_INF",{}).get("TABLE_INF",{})
+    else:
+        return None
+    if not isinstance(table_inf, dict):
+        return None
+    return table_inf.get("UPDATED_DATE")
+
+class JPEStatCache:
+    """
+    日本の政府統計APIのレスポンスキャッシュクラス
+    SQLiteファイルにzlib圧縮したJSONを保存する
+    展開後のサイズがmemory_max_body以下のレスポンス(メタ情報、統計表情報、小さな統計データ)は、
+    変換済みのdictをプロセス内にも最大memory_entries件保持し、参照時の展開とJSONの変換を省く
+    (SQLiteには作成日時の確認のみを行う)。それより大きな統計データは参照のたびに展開、変換する
+    保持したdictは参照のたびに同じものを返すため、getの戻り値のdictは変更しないこと
+    """
+    # エンドポイントごとの有効期間(秒)の既定値
+    DEFAULT_TTL = {
+        "getStatsList": 24 * 60 * 60,
+        "getMetaInfo": 7 * 24 * 60 * 60,
+        "getStatsData": 7 * 24 * 60 * 60,
+    }
+
+    def __init__(self, path: str = "jpestat_cache.sqlite3",
+                 ttl: dict | None = None,
+                 max_size: int = 1024 * 1024 * 1024,
+                 compress_level: int = 6,
+                 revalidate: bool = True,
+                 memory_entries: int = 16,
+                 memory_max_body: int = 256 * 1024,
+                 access_update_ratio: float = 0.01):
+        """
+        path: キャッシュを保存するSQLiteファイルのパス
+        ttl: エンドポイント名(getStatsList, getMetaInfo, getStatsData)ごとの有効期間(秒)。DEFAULT_TTLを上書きする
+        max_size: キャッシュの最大サイズ(圧縮後のバイト数)。超えた場合は最終参照日時の古い順に削除する
+        compress_level: zlibの圧縮レベル(0-9)
+        revalidate: Trueの場合、有効期間を過ぎたエントリはTABLE_INFの更新日付を確認し、更新されていなければ再利用する
+        memory_entries: プロセス内に保持する変換済みのdictの件数。0の場合は保持しない
+        memory_max_body: プロセス内に保持するレスポンスのJSONの最大サイズ(展開後のバイト数)
+        access_update_ratio: 最終参照日時を更新する間隔(有効期間に対する割合)
+        参照のたびに書き込むと複数プロセスの読み込みが書き込みロックで競合するため、前回の更新からこの間隔以上経過した場合のみ更新する
+        """
+        self.path = path
+        self.ttl = dict(self.DEFAULT_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+        self.max_size = max_size
+        self.compress_level = compress_level
+        self.revalidate = revalidate
+        self.memory_entries = memory_entries
+        self.memory_max_body = memory_max_body
+        self.access_update_ratio = access_update_ratio
+        self._local = threading.local()
+        # キー → (作成日時, 変換済みのdict)
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    updated_date TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache(accessed_at)")
+
+    # スレッドごとにSQLiteの接続を作成する
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """
+        現在のスレッドのSQLite接続を閉じる
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get(self, endpoint: str, params: dict) -> tuple[dict | None, bool, str | None]:
+        """
+        キャッシュからレスポンスを取得する
+        戻り値: (レスポンスのdict, 有効期間内か否か, TABLE_INFの更新日付)
+        エントリが存在しない場合は (None, False, None)
+        """
+        key = make_request_key(endpoint, params)
+        conn = self._connect()
+        memory = self._get_memory(key)
+        # 他のプロセスで置き換えられていないか、作成日時で確認する
+        row = conn.execute(
+            "SELECT updated_date, created_at, accessed_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._discard_memory(key)
+            return None, False, None
+        updated_date, created_at, accessed_at = row
+        if memory is not None and memory[0] == created_at:
+            data = memory[1]
+        else:
+            body = conn.execute("SELECT body FROM cache WHERE key = ?", (key,)).fetchone()
+            if body is None:
+                return None, False, None
+            text = zlib.decompress(body[0])
+            data = json.loads(text)
+            self._put_memory(key, created_at, data, len(text))
+        now = time.time()
+        ttl = self.ttl.get(endpoint, 0)
+        if now - accessed_at >= ttl * self.access_update_ratio:
+            with conn:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        fresh = now - created_at < ttl
+        return data, fresh, updated_date
+
+    def put(self, endpoint: str, params: dict, data: dict):
+        """
+        レスポンスをキャッシュに保存する
+        保存後にmax_sizeを超えた場合は最終参照日時の古いエントリから削除する
+        """
+        key = make_request_key(endpoint, params)
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        body = zlib.compress(text, self.compress_level)
+        if len(body) > self.max_size:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, endpoint, body, size, updated_date, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, body, len(body), get_updated_date(endpoint, data), now, now))
+            self._evict(conn)
+        self._put_memory(key, now, data, len(text))
+
+    def touch(self, endpoint: str, params: dict):
+        """
+        エントリの作成日時を現在時刻に更新し、有効期間を延長する
+        更新日付を確認してデータが更新されていなかった場合に利用する
+        """
+        key = make_request_key(endpoint, params)
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE cache SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+        memory = self._get_memory(key)
+        if memory is not None:
+            with self._memory_lock:
+                self._memory[key] = (now, memory[1])
+
+    def delete(self, endpoint: str, params: dict):
+        """
+        エントリを削除する
+        """
+        key = make_request_key(endpoint, params)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self._discard_memory(key)
+
+    def clear(self):
+        """
+        全エントリを削除する
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache")
+        conn.execute("VACUUM")
+        with self._memory_lock:
+            self._memory.clear()
+
+    def get_size(self) -> int:
+        """
+        キャッシュの合計サイズ(圧縮後のバイト数)を返す
+        """
+        row = self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return row[0]
+
+    # プロセス内に保持した(作成日時, dict)を返す。保持していない場合はNone
+    def _get_memory(self, key: str) -> tuple | None:
+        with self._memory_lock:
+            memory = self._memory.get(key)
+            if memory is not None:
+                self._memory.move_to_end(key)
+            return memory
+
+    # 変換済みのdictをプロセス内に保持し、memory_entries件を超えた場合は参照の古い順に破棄する
+    def _put_memory(self, key: str, created_at: float, data: dict, body_size: int):
+        if self.memory_entries <= 0 or body_size > self.memory_max_body:
+            self._discard_memory(key)
+            return
+        with self._memory_lock:
+            self._memory[key] = (created_at, data)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _discard_memory(self, key: str):
+        with self._memory_lock:
+            self._memory.pop(key, None)
+
+    # 合計サイズがmax_sizeを超えている場合、最終参照日時の古い順に削除する
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_size:
+            return
+        evict_keys = []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            if total <= self.max_size:
+                break
+            evict_keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM cache WHERE key = ?", evict_keys)
+        for (key,) in evict_keys:
+            self._discard_memory(key)
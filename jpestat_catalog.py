@@ -0,0 +1,283 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+
+import pandas as pd # type: ignore[import]
+
+from jpestat_client import JPEStatClient, _as_list, init_env
+
+'''
+日本の政府統計APIの統計表情報をローカルのSQLiteに保存し、オフラインで全文検索するためのカタログ
+統計表情報取得(getStatsList)で全件を一度取得し、以降は更新日付(updatedDate)で差分を取得する
+全文検索にはSQLiteのFTS5(trigramトークナイザ)を使用し、日本語を3文字単位のN-gramで検索する
+'''
+
+# 検索結果の列 (JPEStatListData.get_basic_info_dfと同じ)
+BASIC_INFO_COLUMNS = {
+    "id": "@id",
+    "statistics_name": "STATISTICS_NAME",
+    "cycle": "CYCLE",
+    "survey_date": "SURVEY_DATE",
+    "collect_area": "COLLECT_AREA",
+    "description": "DESCRIPTION",
+    "table_category": "TITLE_SPEC.TABLE_CATEGORY",
+    "table_name": "TITLE_SPEC.TABLE_NAME",
+    "table_explanation": "TITLE_SPEC.TABLE_EXPLANATION",
+}
+
+# 全文検索の対象列
+_FTS_COLUMNS = ("stat_name", "statistics_name", "title", "description", "table_category", "table_name", "table_explanation")
+
+# trigramトークナイザで検索できる最小の文字数
+_FTS_MIN_LENGTH = 3
+
+def _get_text(value) -> str:
+    """
+    TABLE_INFの項目を文字列にする
+    {"@code": ..., "$": ...}形式の場合は$の値、dictやlistの場合は値を連結した文字列
+    """
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        if "$" in value:
+            return str(value["$"])
+        return " ".join(_get_text(item) for item in value.values())
+    if isinstance(value, list):
+        return " ".join(_get_text(item) for item in value)
+    return str(value)
+
+class JPEStatCatalog:
+    """
+    日本の政府統計APIの統計表情報のカタログ
+    """
+    def __init__(self, path: str = "jpestat_catalog.sqlite3"):
+        """
+        path: カタログを保存するSQLiteファイルのパス
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        fts_columns = ", ".join(_FTS_COLUMNS)
+        new_columns = ", ".join(f"new.{column}" for column in _FTS_COLUMNS)
+        old_columns = ", ".join(f"old.{column}" for column in _FTS_COLUMNS)
+        with self.conn:
+            self.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS tables (
+                    row_id INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    stats_code TEXT,
+                    stat_name TEXT,
+                    statistics_name TEXT,
+                    title TEXT,
+                    cycle TEXT,
+                    survey_date TEXT,
+                    collect_area TEXT,
+                    description TEXT,
+                    table_category TEXT,
+                    table_name TEXT,
+                    table_explanation TEXT,
+                    open_date TEXT,
+                    updated_date TEXT
+                );
+                CREATE INDEX IF NOT EXISTS tables_stats_code ON tables(stats_code);
+                CREATE INDEX IF NOT EXISTS tables_survey_date ON tables(survey_date);
+                CREATE INDEX IF NOT EXISTS tables_collect_area ON tables(collect_area);
+                CREATE INDEX IF NOT EXISTS tables_cycle ON tables(cycle);
+                CREATE VIRTUAL TABLE IF NOT EXISTS tables_fts USING fts5(
+                    {fts_columns}, content='tables', content_rowid='row_id', tokenize='trigram');
+                CREATE TRIGGER IF NOT EXISTS tables_ai AFTER INSERT ON tables BEGIN
+                    INSERT INTO tables_fts(rowid, {fts_columns}) VALUES (new.row_id, {new_columns});
+                END;
+                CREATE TRIGGER IF NOT EXISTS tables_ad AFTER DELETE ON tables BEGIN
+                    INSERT INTO tables_fts(tables_fts, rowid, {fts_columns}) VALUES ('delete', old.row_id, {old_columns});
+                END;
+                CREATE TRIGGER IF NOT EXISTS tables_au AFTER UPDATE ON tables BEGIN
+                    INSERT INTO tables_fts(tables_fts, rowid, {fts_columns}) VALUES ('delete', old.row_id, {old_columns});
+                    INSERT INTO tables_fts(rowid, {fts_columns}) VALUES (new.row_id, {new_columns});
+                END;
+                CREATE TABLE IF NOT EXISTS catalog_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_state(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM catalog_state WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_state(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO catalog_state (key, value) VALUES (?, ?)", (key, value))
+
+    # 統計表情報のTABLE_INFをカタログに追加(登録済みの場合は更新)する
+    def _upsert(self, table_inf_list: list) -> int:
+        rows = []
+        for table_inf in table_inf_list:
+            stat_name = table_inf.get("STAT_NAME", {})
+            title_spec = table_inf.get("TITLE_SPEC", {}) if isinstance(table_inf.get("TITLE_SPEC"), dict) else {}
+            rows.append((
+                table_inf.get("@id"),
+                stat_name.get("@code") if isinstance(stat_name, dict) else None,
+                _get_text(stat_name),
+                _get_text(table_inf.get("STATISTICS_NAME")),
+                _get_text(table_inf.get("TITLE")),
+                _get_text(table_inf.get("CYCLE")),
+                _get_text(table_inf.get("SURVEY_DATE")),
+                _get_text(table_inf.get("COLLECT_AREA")),
+                _get_text(table_inf.get("DESCRIPTION")),
+                _get_text(title_spec.get("TABLE_CATEGORY")),
+                _get_text(title_spec.get("TABLE_NAME")),
+                _get_text(title_spec.get("TABLE_EXPLANATION")),
+                _get_text(table_inf.get("OPEN_DATE")),
+                _get_text(table_inf.get("UPDATED_DATE")),
+            ))
+        columns = ("id", "stats_code", "stat_name", "statistics_name", "title", "cycle", "survey_date", "collect_area",
+                   "description", "table_category", "table_name", "table_explanation", "open_date", "updated_date")
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO tables ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}", rows)
+        return len(rows)
+
+    def build(self, client: JPEStatClient, params: dict ={}) -> int:
+        """
+        統計表情報をNEXT_KEYに従って全件取得し、カタログに登録する
+        params: 統計表情報取得のパラメータ (省略時は全統計表)
+        戻り値: 登録した統計表数
+        """
+        today = datetime.date.today().strftime("%Y%m%d")
+        if "updatedDate" not in params:
+            # refreshで同じ範囲の差分を取得するため、パラメータを保存する
+            self._set_state("params", json.dumps(params, ensure_ascii=False))
+        count = 0
+        for stat_list in client.iter_stat_list_json(params=params):
+            count += self._upsert(_as_list(stat_list.get("GET_STATS_LIST",{}).get("DATALIST_INF",{}).get("TABLE_INF")))
+        self._set_state("last_updated", today)
+        return count
+
+    def refresh(self, client: JPEStatClient, params: dict ={}, since: str | None = None) -> int:
+        """
+        前回の取得日以降に更新された統計表情報(updatedDate)のみを取得し、カタログを更新する
+        params: 統計表情報取得のパラメータ。省略時はbuildで指定したパラメータ
+        since: 更新日付の開始日(yyyymmdd)。省略時は前回のbuildまたはrefreshの実行日
+        戻り値: 更新した統計表数
+        """
+        if not params:
+            params = json.loads(self._get_state("params") or "{}")
+        if since is None:
+            since = self._get_state("last_updated")
+        if since is None:
+            return self.build(client, params=params)
+        today = datetime.date.today().strftime("%Y%m%d")
+        refresh_params = dict(params)
+        refresh_params["updatedDate"] = f"{since}-{today}"
+        return self.build(client, params=refresh_params)
+
+    def count(self) -> int:
+        """
+        カタログに登録されている統計表数を返す
+        """
+        return self.conn.execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+
+    def search(self, query: str | None = None, stats_code: str | None = None, survey_date: str | None = None,
+               collect_area: str | None = None, cycle: str | None = None, limit: int | None = 100) -> pd.DataFrame:
+        """
+        カタログを検索し、JPEStatListData.get_basic_info_dfと同じ列のDataFrameを返す
+        query: 検索キーワード。空白区切りで複数指定した場合はAND検索
+        (3文字以上のキーワードは全文検索、2文字以下は部分一致で検索する)
+        stats_code: 政府統計コード(8桁)。5桁の場合は作成機関で検索する
+        survey_date: 調査年月 (前方一致。例: 2020)
+        collect_area: 集計地域区分 (全国、都道府県、市区町村)
+        cycle: 周期 (年次、月次等)
+        limit: 最大件数。Noneの場合は全件
+        """
+        conditions = []
+        args: list = []
+        join = ""
+        order = "t.id"
+        fts_terms = []
+        for term in (query or "").split():
+            if len(term) >= _FTS_MIN_LENGTH:
+                fts_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                conditions.append("(" + " OR ".join(f"t.{column} LIKE ?" for column in _FTS_COLUMNS) + ")")
+                args.extend(["%" + term + "%"] * len(_FTS_COLUMNS))
+        if fts_terms:
+            join = "JOIN tables_fts f ON f.rowid = t.row_id"
+            conditions.insert(0, "tables_fts MATCH ?")
+            args.insert(0, " AND ".join(fts_terms))
+            order = "f.rank"
+        if stats_code is not None:
+            if len(stats_code) == 5:
+                conditions.append("t.stats_code LIKE ?")
+                args.append(stats_code + "%")
+            else:
+                conditions.append("t.stats_code = ?")
+                args.append(stats_code)
+        if survey_date is not None:
+            conditions.append("t.survey_date LIKE ?")
+            args.append(survey_date + "%")
+        if collect_area is not None:
+            conditions.append("t.collect_area = ?")
+            args.append(collect_area)
+        if cycle is not None:
+            conditions.append("t.cycle = ?")
+            args.append(cycle)
+
+        select_columns = ", ".join(f"t.{column}" for column in BASIC_INFO_COLUMNS)
+        sql = f"SELECT {select_columns} FROM tables t {join}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        rows = self.conn.execute(sql, args).fetchall()
+        return pd.DataFrame(rows, columns=list(BASIC_INFO_COLUMNS.values()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="e-Stat統計表カタログ")
+    parser.add_argument("--db", default="jpestat_catalog.sqlite3", help="カタログのSQLiteファイル")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="統計表情報を全件取得してカタログを作成する")
+    build_parser.add_argument("--stats-code", help="政府統計コードで絞り込む")
+    refresh_parser = subparsers.add_parser("refresh", help="前回以降に更新された統計表情報を取得する")
+    refresh_parser.add_argument("--since", help="更新日付の開始日(yyyymmdd)")
+    search_parser = subparsers.add_parser("search", help="カタログを検索する")
+    search_parser.add_argument("query", nargs="?", help="検索キーワード")
+    search_parser.add_argument("--stats-code")
+    search_parser.add_argument("--survey-date")
+    search_parser.add_argument("--collect-area")
+    search_parser.add_argument("--cycle")
+    search_parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    with JPEStatCatalog(args.db) as catalog:
+        if args.command == "search":
+            df = catalog.search(args.query, stats_code=args.stats_code, survey_date=args.survey_date,
+                                collect_area=args.collect_area, cycle=args.cycle, limit=args.limit)
+            print(df.to_csv(index=False))
+        else:
+            init_env()
+            app_id = os.getenv("JPESTAT_APP_ID", "")
+            if not app_id:
+                raise ValueError("JPESTAT_APP_ID is not set in the environment variables.")
+            with JPEStatClient(app_id=app_id, lang="J") as client:
+                if args.command == "build":
+                    params = {"statsCode": args.stats_code} if args.stats_code else {}
+                    count = catalog.build(client, params=params)
+                else:
+                    count = catalog.refresh(client, since=args.since)
+            print(f"{count} tables registered. (total: {catalog.count()})")
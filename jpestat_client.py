@@ -1,6 +1,20 @@
+import csv
+import io
 import os
+import random
+import re
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
 
+import ijson # type: ignore[import]
 import requests # type: ignore[import]
+from requests.adapters import HTTPAdapter # type: ignore[import]
+
+from jpestat_cache import JPEStatCache, get_updated_date, make_request_key
+from jpestat_ratelimit import JPEStatRateLimiter
+import numpy as np # type: ignore[import]
 import pandas as pd # type: ignore[import]
 from dotenv import load_dotenv
 
@@ -12,13 +26,563 @@ https://www.e-stat.go.jp/api/api_info/e-stat_api.html
 https://www.e-stat.go.jp/api/api/api/index.php/api-info/credit
 '''
 
-class JPEStatData:
+def _as_list(value) -> list:
+    """
+    e-Statのレスポンスは要素が1件の場合にlistではなくdictになるため、常にlistとして扱う
+    """
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+def _get_stat_data_next_key(stat_data: dict):
+    """
+    統計データのRESULT_INF.NEXT_KEYを取得する。継続データがない場合はNone
+    """
+    return stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("RESULT_INF",{}).get("NEXT_KEY")
+
+def _peek_stat_data_next_key(content: bytes):
+    """
+    統計データのJSON(バイト列)からRESULT_INF.NEXT_KEYを取得する。存在しない場合はNone
+    RESULT_INFはVALUEより前にあるため、RESULT_INFまでを読み込んだ時点で終了する
+    """
+    for prefix, event, value in ijson.parse(io.BytesIO(content)):
+        if prefix == "GET_STATS_DATA.STATISTICAL_DATA.RESULT_INF.NEXT_KEY":
+            return value
+        if event == "end_map" and prefix in ("GET_STATS_DATA.STATISTICAL_DATA.RESULT_INF", "GET_STATS_DATA.STATISTICAL_DATA"):
+            return None
+    return None
+
+def _get_stat_list_next_key(stat_list: dict):
+    """
+    統計表情報のRESULT_INF.NEXT_KEYを取得する。継続データがない場合はNone
+    """
+    return stat_list.get("GET_STATS_LIST",{}).get("DATALIST_INF",{}).get("RESULT_INF",{}).get("NEXT_KEY")
+
+def _get_backoff(attempt: int, backoff_factor: float, backoff_max: float) -> float:
+    """
+    リトライ間隔(秒)を計算する
+    Full Jitter: 0 ～ min(上限, 基準値 * 2^試行回数) のランダムな時間
+    """
+    return random.uniform(0, min(backoff_max, backoff_factor * (2 ** attempt)))
+
+def _get_result_status(data: dict) -> int:
+    """
+    レスポンスのRESULT.STATUSを取得する。取得できない場合は0
+    """
+    for value in data.values():
+        if isinstance(value, dict) and "RESULT" in value:
+            try:
+                return int(value["RESULT"].get("STATUS", 0))
+            except (TypeError, ValueError):
+                return 0
+    return 0
+
+def _emit(hooks, event: dict):
+    """
+    hooksの各関数にイベントを通知する
+    """
+    if hooks:
+        for hook in hooks:
+            hook(event)
+
+def _decode_json(response: requests.Response) -> dict:
+    return response.json()
+
+def _decode_content(response: requests.Response) -> bytes:
+    return response.content
+
+def _decode_stat_data_stream(response: requests.Response, value_options: dict) -> tuple[dict, pd.DataFrame]:
+    with response:
+        # gzipで圧縮されたレスポンスを展開しながら読み込む
+        response.raw.decode_content = True
+        return parse_stat_data_stream(response.raw, **value_options)
+
+def _get_response_bytes(response: requests.Response) -> int:
+    """
+    レスポンスの受信バイト数(圧縮されている場合は圧縮後)を返す
+    """
+    try:
+        return int(response.raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        pass
+    try:
+        return len(response.content)
+    except RuntimeError:
+        # stream=Trueで読み込み済みの場合は取得できない
+        return 0
+
+# VALUEの変換内容(get_value_dfの引数)の既定値
+DEFAULT_VALUE_OPTIONS = {"numeric": True, "categorical": True, "flag_special": False}
+
+def _get_value_options(value_options: dict | None) -> dict:
+    """
+    VALUEの変換内容のdictに既定値を補ったdictを返す。未知のキーはValueError
+    """
+    value_options = dict(DEFAULT_VALUE_OPTIONS, **(value_options or {}))
+    unknown = set(value_options).difference(DEFAULT_VALUE_OPTIONS)
+    if unknown:
+        raise ValueError(f"unknown value_options: {sorted(unknown)}")
+    return value_options
+
+def _to_categorical(column) -> pd.Categorical:
+    """
+    コード値のlistをcategory型に変換する
+    pd.factorizeで一意な値を求め、カテゴリをコード順に並べ替える
+    """
+    codes, uniques = pd.factorize(np.asarray(column, dtype=object), use_na_sentinel=True)
+    if len(uniques) == 0:
+        # 全て欠損値の場合
+        return pd.Categorical.from_codes(codes, categories=pd.Index([], dtype=object))
+    order = np.argsort(uniques)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    codes = np.where(codes < 0, -1, rank[codes])
+    return pd.Categorical.from_codes(codes, categories=pd.Index(uniques[order], dtype=object))
+
+def _take_class_attr(classes: list, attr: str, positions: np.ndarray, fallback=None) -> np.ndarray:
+    """
+    CLASSのlistから、positions(CLASS内の位置)ごとにattrの値を取り出す
+    positionsが-1(CLASSに存在しないコード)の場合はfallbackの値(配列の場合は同じ位置の値)にする
+    """
+    attr_values = np.array([class_data.get(attr) for class_data in classes] + [None], dtype=object)
+    result = attr_values[positions]
+    missing = positions < 0
+    if missing.any():
+        result[missing] = fallback[missing] if isinstance(fallback, np.ndarray) else fallback
+    return result
+
+def _remap_categorical(categorical: pd.Categorical, category_values: np.ndarray) -> pd.Categorical:
+    """
+    categoricalの各カテゴリをcategory_values(カテゴリと同じ順序の値)に置き換えたcategory型を作成する
+    置き換え後の値が重複する場合は1つのカテゴリにまとめる
+    """
+    new_codes, uniques = pd.factorize(category_values, use_na_sentinel=True)
+    codes = categorical.codes
+    codes = np.where(codes < 0, -1, new_codes[codes] if len(new_codes) else -1)
+    return pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+
+def decode_value_columns(columns: dict, numeric: bool = True, categorical: bool = True, flag_special: bool = False) -> pd.DataFrame:
+    """
+    統計データのVALUEの列名をキー、値のlistを値とするdictをDataFrameに変換する
+    @で始まるコード列はcategory型、$列は数値型(Int64またはFloat64)に変換する
+    数値に変換できない$列の値(-、…、***、X等の特殊文字)は欠損値とし、flag_specialがTrueの場合は元の値を$special列に格納する
+    """
+    data = {}
+    for key, column in columns.items():
+        if key == "$":
+            if not numeric:
+                data[key] = pd.Series(column, dtype=object)
+                continue
+            raw = pd.Series(column, dtype=object)
+            value = pd.to_numeric(raw, errors="coerce", dtype_backend="numpy_nullable")
+            if len(value) > 0 and value.isna().all():
+                # 全て特殊文字の場合は、他のページと連結した際に整数型が浮動小数点型にならないようにする
+                value = value.astype("Int64")
+            data[key] = value
+            if flag_special:
+                special = raw.where(value.isna() & raw.notna())
+                # 他の列、他のページと連結できるよう、カテゴリの型を_to_categoricalに揃える
+                data["$special"] = _to_categorical(special) if categorical else special
+        elif categorical and key.startswith("@"):
+            data[key] = _to_categorical(column)
+        else:
+            data[key] = pd.Series(column, dtype=object)
+    return pd.DataFrame(data)
+
+def decode_value_list(values, numeric: bool = True, categorical: bool = True, flag_special: bool = False) -> pd.DataFrame:
+    """
+    統計データのDATA_INF.VALUE(dictのlist)をDataFrameに変換する
+    pd.json_normalizeを使わず、キーごとに列を直接作成する
+    変換の内容はdecode_value_columnsを参照
+    """
+    values = _as_list(values)
+    if len(values) == 0:
+        return pd.DataFrame()
+    # 先頭行のキーの順序を維持し、注釈(@annotation)等の一部の行にのみ存在するキーを後ろに追加する
+    keys = list(values[0])
+    keys.extend(sorted(set().union(*values).difference(keys)))
+    columns = {key: [row.get(key) for row in values] for key in keys}
+    return decode_value_columns(columns, numeric=numeric, categorical=categorical, flag_special=flag_special)
+
+def concat_value_df(chunks) -> pd.DataFrame:
+    """
+    ページごとのVALUEのDataFrameを連結する
+    category型の列はカテゴリを統合してcategory型のまま連結する
+    """
+    chunks = [chunk for chunk in chunks if len(chunk.columns) > 0]
+    if len(chunks) == 0:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    columns = list(dict.fromkeys(column for chunk in chunks for column in chunk.columns))
+    data = {}
+    for column in columns:
+        parts = [chunk[column] if column in chunk.columns else pd.Series([None] * len(chunk), dtype=object) for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            union = pd.api.types.union_categoricals([part.array for part in parts], sort_categories=True)
+            data[column] = pd.Categorical.from_codes(union.codes, categories=pd.Index(union.categories, dtype=object))
+        else:
+            data[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(data)
+
+def parse_stat_data_stream(stream, numeric: bool = True, categorical: bool = True, flag_special: bool = False,
+                           chunk_rows: int = 50_000) -> tuple[dict, pd.DataFrame]:
+    """
+    統計データのJSONをファイルライクオブジェクトから逐次的に読み込む
+    VALUEはchunk_rows行ごとにDataFrameに変換し、レスポンス全体をdictとして保持しない
+    戻り値: (VALUEを除いた統計データのdict, VALUEのDataFrame)
+    """
+    value_prefix = "GET_STATS_DATA.STATISTICAL_DATA.DATA_INF.VALUE"
+    builder = ijson.ObjectBuilder()
+    chunks: list[pd.DataFrame] = []
+    rows: list[dict] = []
+    row: dict | None = None
+    row_prefix = ""
+    key = ""
+
+    for prefix, event, value in ijson.parse(stream):
+        if row is not None:
+            # VALUEの1行分を読み込み中
+            if prefix == row_prefix:
+                if event == "map_key":
+                    key = value
+                elif event == "end_map":
+                    rows.append(row)
+                    row = None
+                    if len(rows) >= chunk_rows:
+                        chunks.append(decode_value_list(rows, numeric=numeric, categorical=categorical, flag_special=flag_special))
+                        rows = []
+            else:
+                row[key] = value
+        elif prefix == value_prefix or prefix == value_prefix + ".item":
+            if event == "start_map":
+                # VALUEの行の開始 (1行のみの場合はlistではなくdictになる)
+                row = {}
+                row_prefix = prefix
+            elif event in ("start_array", "end_array"):
+                # VALUE自体は空のlistとして構築する
+                builder.event(event, value)
+            if prefix == value_prefix and event == "start_map":
+                builder.event("start_array", None)
+                builder.event("end_array", None)
+        else:
+            builder.event(event, value)
+
+    if len(rows) > 0:
+        chunks.append(decode_value_list(rows, numeric=numeric, categorical=categorical, flag_special=flag_special))
+    stat_data = builder.value if isinstance(builder.value, dict) else {}
+    # VALUEはDataFrameのみを保持する
+    stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("DATA_INF",{}).pop("VALUE", None)
+    return stat_data, concat_value_df(chunks)
+
+# CSV形式の統計データのVALUEセクションの開始行
+_CSV_VALUE_SECTION = re.compile(rb'^"?VALUE"?\r?$', re.MULTILINE)
+# CSV形式の統計データの先頭のRESULTセクションの開始行 (エラー時、該当データなしの場合はVALUEセクションがない)
+_CSV_RESULT_SECTION = re.compile(rb'^"?RESULT"?\r?$', re.MULTILINE)
+# CSV形式の統計データでRESULT_INFに格納する項目
+_CSV_RESULT_INF_KEYS = ("TOTAL_NUMBER", "FROM_NUMBER", "TO_NUMBER", "NEXT_KEY")
+
+def _parse_simple_stat_data_header(header: str) -> dict:
+    """
+    CSV形式の統計データのVALUEセクションより前(RESULT、PARAMETER、STATISTICAL_DATA等)を
+    JSON形式の統計データと同じ構造のdictに変換する
+    """
+    sections: dict = {}
+    statistical_data: dict = {"RESULT_INF": {}}
+    section: dict = {}
+    for row in csv.reader(io.StringIO(header)):
+        if len(row) == 0 or all(value == "" for value in row):
+            continue
+        if len(row) == 1 or all(value == "" for value in row[1:]):
+            # セクションヘッダ
+            section = sections.setdefault(row[0], {})
+            continue
+        key, values = row[0], [value for value in row[1:] if value != ""]
+        if len(values) == 2:
+            # コードと名称の組 (JSON形式の{"@code": ..., "$": ...}に合わせる)
+            value = {"@code": values[0], "$": values[1]}
+        else:
+            value = values[0] if len(values) == 1 else values
+        if key in _CSV_RESULT_INF_KEYS:
+            statistical_data["RESULT_INF"][key] = value
+        elif key == "TABLE_INF":
+            # 以降の行は統計表情報
+            section = sections.setdefault("TABLE_INF", {"@id": value})
+        else:
+            section[key] = value
+
+    result = {
+        "RESULT": sections.pop("RESULT", {}),
+        "PARAMETER": sections.pop("PARAMETER", {}),
+        "STATISTICAL_DATA": statistical_data,
+    }
+    sections.pop("STATISTICAL_DATA", None)
+    statistical_data["TABLE_INF"] = sections.pop("TABLE_INF", {})
+    statistical_data.update(sections)
+    return {"GET_STATS_DATA": result}
+
+def _read_csv_table(table: bytes, engine: str = "c") -> pd.DataFrame:
+    """
+    ヘッダ行付きのCSVを全列文字列としてDataFrameに読み込む。空文字列は欠損値とする
+    """
+    if engine != "pyarrow":
+        return pd.read_csv(io.BytesIO(table), engine=engine, dtype=str, keep_default_na=False, na_values=[""])
+    # pandasのpyarrowエンジンはdtype=strを指定しても数値に変換してからキャストし、コードの先頭の0が失われるため
+    # pyarrow.csvで列の型を直接指定する
+    import pyarrow as pa # type: ignore[import]
+    import pyarrow.csv as pa_csv # type: ignore[import]
+    names = next(csv.reader([table.split(b"\n", 1)[0].decode("utf-8").rstrip("\r")]))
+    convert_options = pa_csv.ConvertOptions(column_types={name: pa.string() for name in names}, strings_can_be_null=True)
+    return pa_csv.read_csv(io.BytesIO(table), convert_options=convert_options).to_pandas()
+
+def parse_simple_stat_data_csv(content: bytes, engine: str = "c", numeric: bool = True, categorical: bool = True,
+                               flag_special: bool = False, section_header: bool = True) -> tuple[dict, pd.DataFrame]:
+    """
+    CSV形式の統計データ(getSimpleStatsData)を、JSON形式と同じ構造に変換する
+    engine: pandas.read_csvのengine ("c" または "pyarrow")
+    section_header: sectionHeaderFlg=2(セクションヘッダなし)で取得した場合はFalse
+    VALUEセクションの「xxx_code」列は「@xxx」列、unitは@unit、valueは$、annotationは@annotationに変換する
+    各コード列の次の名称列からCLASS_INF.CLASS_OBJを作成する
+    エラー(STATUSが100以上)の場合はJSON形式と同様にRESULT、PARAMETERのみを返す
+    戻り値: (VALUEを除いた統計データのdict, VALUEのDataFrame)
+    """
+    if content.startswith(b"\xef\xbb\xbf"):
+        content = content[3:]
+    # sectionHeaderFlg=1の場合はVALUEセクションの前にヘッダがある
+    match = _CSV_VALUE_SECTION.search(content)
+    if match is not None:
+        header, table = content[:match.start()], content[match.end():].lstrip(b"\r\n")
+    elif section_header or _CSV_RESULT_SECTION.match(content.lstrip()):
+        # エラー、該当データなしの場合はヘッダのみ
+        header, table = content, b""
+    else:
+        header, table = b"", content
+    stat_data = _parse_simple_stat_data_header(header.decode("utf-8"))
+    if _get_result_status(stat_data) >= 100:
+        stat_data["GET_STATS_DATA"].pop("STATISTICAL_DATA")
+
+    if table.strip() == b"":
+        return stat_data, pd.DataFrame()
+    table_df = _read_csv_table(table, engine=engine)
+
+    columns: dict = {}
+    class_obj_list = []
+    names = list(table_df.columns)
+    for i, name in enumerate(names):
+        if name.endswith("_code"):
+            class_id = name[:-len("_code")]
+            codes = table_df[name]
+            columns["@" + class_id] = codes.to_numpy(dtype=object)
+            if i + 1 < len(names) and not names[i + 1].endswith("_code") and names[i + 1] not in ("unit", "value", "annotation"):
+                label_name = names[i + 1]
+                pairs = table_df[[name, label_name]].drop_duplicates(subset=name).dropna(subset=[name])
+                class_obj_list.append({
+                    "@id": class_id,
+                    "@name": label_name,
+                    "CLASS": [{"@code": code, "@name": label} for code, label in pairs.itertuples(index=False)],
+                })
+        elif name == "unit":
+            columns["@unit"] = table_df[name].to_numpy(dtype=object)
+        elif name == "value":
+            columns["$"] = table_df[name].to_numpy(dtype=object)
+        elif name == "annotation" and table_df[name].notna().any():
+            columns["@annotation"] = table_df[name].to_numpy(dtype=object)
+    del table_df
+
+    stat_data["GET_STATS_DATA"]["STATISTICAL_DATA"]["CLASS_INF"] = {"CLASS_OBJ": class_obj_list}
+    return stat_data, decode_value_columns(columns, numeric=numeric, categorical=categorical, flag_special=flag_special)
+
+def merge_class_obj(class_obj_lists) -> list:
+    """
+    ページごとのCLASS_INF.CLASS_OBJを@idごとに統合する。CLASSは@codeの重複を除いて連結する
+    """
+    merged: dict = {}
+    for class_obj_list in class_obj_lists:
+        for class_obj in _as_list(class_obj_list):
+            target = merged.get(class_obj["@id"])
+            if target is None:
+                merged[class_obj["@id"]] = dict(class_obj, CLASS=list(_as_list(class_obj.get("CLASS"))))
+                continue
+            codes = {class_data.get("@code") for class_data in target["CLASS"]}
+            target["CLASS"].extend(class_data for class_data in _as_list(class_obj.get("CLASS")) if class_data.get("@code") not in codes)
+    return list(merged.values())
+
+# 絞り込み条件の単一コードに指定できるコードの最大数
+_MAX_CODES_PER_PARAM = 100
+
+def _split_stat_data_params(params: dict, estimated_rows: float, dimensions: list, max_rows: int) -> list[dict]:
+    """
+    統計データ取得のパラメータを、推定件数がmax_rows以下になるように事項のコードで分割する
+    dimensions: (パラメータ名の事項部分(Time、Area、Cat01等), コードのlist)のlist。先頭の事項から順に分割する
+    各事項の件数はコードごとに均等と仮定して推定する
+    """
+    if estimated_rows <= max_rows or len(dimensions) == 0:
+        return [params]
+    (name, codes), rest = dimensions[0], dimensions[1:]
+    rows_per_code = estimated_rows / len(codes)
+    group_size = max(1, min(_MAX_CODES_PER_PARAM, int(max_rows // rows_per_code)))
+    slices = []
+    for i in range(0, len(codes), group_size):
+        group = codes[i:i + group_size]
+        slice_params = dict(params)
+        slice_params["cd" + name] = ",".join(group)
+        slices.extend(_split_stat_data_params(slice_params, rows_per_code * len(group), rest, max_rows))
+    return slices
+
+def concat_stat_data_json(pages) -> dict:
+    """
+    NEXT_KEYで分割取得した統計データのdictを1つに結合する
+    先頭ページのTABLE_INF、CLASS_INFを使用し、各ページのVALUEを連結する
+    各ページのdictは複数の呼び出し元で共有されている場合があるため変更しない
+    """
+    first_page: dict = {}
+    values: list = []
+    last_result_inf: dict = {}
+    for page in pages:
+        statistical_data = page.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{})
+        if not first_page:
+            first_page = page
+        values.extend(_as_list(statistical_data.get("DATA_INF",{}).get("VALUE")))
+        last_result_inf = statistical_data.get("RESULT_INF",{})
+
+    if not first_page:
+        return {}
+    # 先頭ページのVALUE、RESULT_INFまでの階層をコピーして置き換える
+    result = dict(first_page)
+    get_stats_data = result["GET_STATS_DATA"] = dict(result.get("GET_STATS_DATA",{}))
+    statistical_data = get_stats_data["STATISTICAL_DATA"] = dict(get_stats_data.get("STATISTICAL_DATA",{}))
+    statistical_data["DATA_INF"] = dict(statistical_data.get("DATA_INF",{}), VALUE=values)
+    # RESULT_INFを結合後の範囲に更新
+    result_inf = statistical_data["RESULT_INF"] = dict(statistical_data.get("RESULT_INF",{}))
+    result_inf.pop("NEXT_KEY", None)
+    if "TO_NUMBER" in last_result_inf:
+        result_inf["TO_NUMBER"] = last_result_inf["TO_NUMBER"]
+    return result
+
+def concat_stat_list_json(pages) -> dict:
+    """
+    NEXT_KEYで分割取得した統計表情報のdictを1つに結合する
+    各ページのdictは複数の呼び出し元で共有されている場合があるため変更しない
+    """
+    first_page: dict = {}
+    table_inf: list = []
+    last_result_inf: dict = {}
+    for page in pages:
+        datalist_inf = page.get("GET_STATS_LIST",{}).get("DATALIST_INF",{})
+        if not first_page:
+            first_page = page
+        table_inf.extend(_as_list(datalist_inf.get("TABLE_INF")))
+        last_result_inf = datalist_inf.get("RESULT_INF",{})
+
+    if not first_page:
+        return {}
+    result = dict(first_page)
+    get_stats_list = result["GET_STATS_LIST"] = dict(result.get("GET_STATS_LIST",{}))
+    datalist_inf = get_stats_list["DATALIST_INF"] = dict(get_stats_list.get("DATALIST_INF",{}), TABLE_INF=table_inf)
+    result_inf = datalist_inf["RESULT_INF"] = dict(datalist_inf.get("RESULT_INF",{}))
+    result_inf.pop("NEXT_KEY", None)
+    if "TO_NUMBER" in last_result_inf:
+        result_inf["TO_NUMBER"] = last_result_inf["TO_NUMBER"]
+    return result
+
+class _SingleFlight:
+    """
+    同じキーの処理が同時に実行された場合に、最初の1回だけを実行して結果を共有する
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key: str, func):
+        """
+        keyの処理が実行中であれば完了を待ってその結果(例外)を返し、実行中でなければfuncを実行する
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class _JPEStatSections:
+    """
+    レスポンスの各セクションを初回アクセス時に変換し、結果を保持する基底クラス
+    hooksが設定されている場合は、変換ごとにconvertイベント(変換時間、行数)を通知する
+    """
+    __slots__ = ("_sections", "hooks")
+
+    def __init__(self, hooks: list | None = None):
+        self._sections: dict = {}
+        self.hooks = hooks
+
+    # keyの変換結果を返す。未変換の場合はfactoryで変換して保持する
+    def _get_section(self, key, factory):
+        if key not in self._sections:
+            started = time.perf_counter()
+            section = factory()
+            if self.hooks:
+                _emit(self.hooks, {
+                    "event": "convert",
+                    "class": type(self).__name__,
+                    "section": key[0] if isinstance(key, tuple) else key,
+                    "rows": len(section) if isinstance(section, pd.DataFrame) else None,
+                    "conversion_time": time.perf_counter() - started,
+                })
+            self._sections[key] = section
+        return self._sections[key]
+
+    def clear_sections(self):
+        """
+        保持している変換結果を破棄する
+        """
+        self._sections.clear()
+
+class JPEStatData(_JPEStatSections):
     """
     日本の政府統計APIのデータクラス
+    各セクションは初回アクセス時に変換して保持し、2回目以降は変換しない
     """
-    def __init__(self, stats_data_id, stat_data: dict ={}):
+    __slots__ = ("stats_data_id", "stat_data", "value_df", "value_options")
+
+    def __init__(self, stats_data_id, stat_data: dict ={}, value_df: pd.DataFrame | None = None, hooks: list | None = None,
+                 value_options: dict | None = None):
+        """
+        value_df: 変換済みのVALUEのDataFrame。指定した場合、stat_dataのVALUEの代わりに使用する
+        (低メモリモードでは、VALUEをdictとして保持せずにDataFrameのみを保持する)
+        hooks: DataFrameへの変換時間を通知する関数のリスト (JPEStatClientのhooksと同じ)
+        value_options: value_dfの変換内容 (get_value_dfのnumeric、categorical、flag_special)。省略時は既定値
+        """
+        super().__init__(hooks)
         self.stats_data_id = stats_data_id
         self.stat_data = stat_data
+        self.value_df = value_df
+        self.value_options = _get_value_options(value_options)
+
+    def _get_statistical_data(self) -> dict:
+        return self.stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{})
+
+    # CLASS_OBJのlistを返す
+    def _get_class_obj_list(self) -> list:
+        return self._get_section("class_obj_list", lambda: _as_list(self._get_statistical_data().get("CLASS_INF",{}).get("CLASS_OBJ",[])))
+
+    # CLASS_OBJの@idをキーとするdictを返す
+    def _get_class_obj_index(self) -> dict:
+        return self._get_section("class_obj_index", lambda: {class_obj.get("@id"): class_obj for class_obj in self._get_class_obj_list()})
 
     # 統計データからDataFrameを返す
     def get_table_info_df(self) -> pd.DataFrame:
@@ -26,8 +590,8 @@ class JPEStatData:
         3.4. 統計データ取得
         """
         # DataFrameに変換
-        df = pd.json_normalize(self.stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("TABLE_INF",[]))   
-        return df
+        df = self._get_section("table_info_df", lambda: pd.json_normalize(self._get_statistical_data().get("TABLE_INF",[])))
+        return df.copy()
     
     # 統計データのdictからCLASS_INFを取得してDataFrameを返す
     def get_class_info_df(self) -> pd.DataFrame:
@@ -35,16 +599,31 @@ class JPEStatData:
         統計データからCLASS_OBJを取得
         """
         # DataFrameに変換
-        df = pd.json_normalize(self.stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("CLASS_INF",{}).get("CLASS_OBJ",[]))   
-        return df
+        df = self._get_section("class_info_df", lambda: pd.json_normalize(self._get_class_obj_list()))
+        return df.copy()
     
     # 統計データのdictからVLALUEを取得してDataFrameを返す
-    def get_value_df(self) -> pd.DataFrame:
+    def get_value_df(self, numeric: bool = True, categorical: bool = True, flag_special: bool = False) -> pd.DataFrame:
         """
         統計データからVALUEを取得
+        numeric: Trueの場合、$列を数値型に変換する。特殊文字(-、…、***、X等)は欠損値になる
+        categorical: Trueの場合、@tab、@cat01～@cat15、@area、@time、@unit等のコード列をcategory型にする
+        flag_special: Trueの場合、数値に変換できなかった$列の元の値を$special列に格納する
+        value_dfが指定されている場合(低メモリモード、CSV形式)は変換済みのため、value_optionsと異なる指定はValueError
+        (取得時にJPEStatClientのvalue_optionsで指定する)
         """
-        # DataFrameに変換
-        df = pd.json_normalize(self.stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("DATA_INF",{}).get("VALUE",[]))   
+        if self.value_df is not None:
+            requested = {"numeric": numeric, "categorical": categorical, "flag_special": flag_special}
+            if requested != self.value_options:
+                raise ValueError(
+                    f"value_df was decoded with {self.value_options}, but {requested} was requested. "
+                    "Pass value_options when fetching the data.")
+            df = self.value_df.copy()
+        else:
+            # DataFrameに変換
+            df = self._get_section(("value_df", numeric, categorical, flag_special), lambda: decode_value_list(
+                self._get_statistical_data().get("DATA_INF",{}).get("VALUE",[]),
+                numeric=numeric, categorical=categorical, flag_special=flag_special)).copy()
         # statsDataIdを1列目の全テータに追加
         df.insert(0, "statsDataId", self.stats_data_id)
 
@@ -57,56 +636,110 @@ class JPEStatData:
         統計データからCLASS_OBJを取得
         column_id: CLASS_OBJの@id列の値
         """
-        class_data_list = self.stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("CLASS_INF",{}).get("CLASS_OBJ",[])
-        target_class_data = [class_data for class_data in class_data_list if class_data.get("@id") == column_id]
-        if len(target_class_data) == 0:
+        target_class_data = self._get_class_obj_index().get(column_id)
+        if target_class_data is None:
             return pd.DataFrame()
         # DataFrameに変換
-        df = pd.json_normalize(target_class_data[0].get("CLASS",[]))
-        return df
+        df = self._get_section(("column_info_df", column_id), lambda: pd.json_normalize(_as_list(target_class_data.get("CLASS",[]))))
+        return df.copy()
 
     # 統計データのdictからCLASS_OBJとVALUEを取得して結合したDataFrameを返す
-    def get_column_modified_values_df(self, params: dict ={}) -> pd.DataFrame:
+    def get_column_modified_values_df(self, params: dict ={}, decode_labels: bool = False, hierarchy: bool = False) -> pd.DataFrame:
         """
         統計データからCLASS_OBJとVALUEを取得して結合
         「@ + CLASS_OBJの@id列の値」がVALUEの各列名に対応する
         VAULEの列名をCLASS_OBJの@name列の値に置き換える
         @unitは「単位」に置き換える
         $は値に置き換える
+        decode_labels: Trueの場合、各列のコードをCLASS_OBJ[*].CLASSの@nameに置き換える(category型)
+        hierarchy: Trueの場合、各列の後ろに「列名.@level」「列名.@parentCode」列を追加する
         """
         # CLASS_OBJを取得
-        class_df = self.get_class_info_df()
+        class_obj_list = self._get_class_obj_list()
         # VALUEを取得
-        value_df = self.get_value_df()
+        value_df = self.get_value_df(**self.value_options)
         # CLASS_OBJの@id列をVALUEの各列名に対応させる
-        # class_dfの@idをキーに@nameへのマッピングを作成
-        # value_dfの列名を置き換える
-        class_mapping = { "@" + row["@id"]: row["@name"] for _, row in class_df.iterrows()}
+        # CLASS_OBJの@idをキーに@nameへのマッピングを作成
+        class_mapping = { "@" + class_obj["@id"]: class_obj["@name"] for class_obj in class_obj_list}
+
+        if decode_labels or hierarchy:
+            for class_obj in class_obj_list:
+                column = "@" + class_obj["@id"]
+                if column not in value_df.columns:
+                    continue
+                classes = _as_list(class_obj.get("CLASS"))
+                codes = value_df[column]
+                if not isinstance(codes.dtype, pd.CategoricalDtype):
+                    codes = pd.Series(_to_categorical(codes.to_numpy(dtype=object)), index=value_df.index)
+                # カテゴリ(一意なコード)ごとにCLASS内の位置を求め、行ごとの処理は行わない
+                positions = pd.Index([class_data.get("@code") for class_data in classes], dtype=object).get_indexer(codes.cat.categories)
+                if hierarchy:
+                    loc = value_df.columns.get_loc(column)
+                    for i, attr in enumerate(("@level", "@parentCode")):
+                        attr_values = _take_class_attr(classes, attr, positions, fallback=None)
+                        value_df.insert(loc + 1 + i, column + "." + attr, _remap_categorical(codes.array, attr_values))
+                        class_mapping[column + "." + attr] = class_obj["@name"] + "." + attr
+                if decode_labels:
+                    labels = _take_class_attr(classes, "@name", positions, fallback=codes.cat.categories.to_numpy(dtype=object))
+                    value_df[column] = _remap_categorical(codes.array, labels)
+
         # @unitを「単位」に置き換える
         class_mapping["@unit"] = "単位"
         # $は値に置き換える
         class_mapping["$"] = "値"
+        # $specialは特殊文字に置き換える
+        class_mapping["$special"] = "特殊文字"
         # value_dfの列名を置き換える
         value_df.rename(columns=class_mapping, inplace=True)
         
         return value_df
 
-class JPEStatListData:
+    def release_raw(self):
+        """
+        VALUEをDataFrameに変換し、レスポンスのdictを破棄する
+        TABLE_INF、CLASS_INF等のVALUE以外のセクションは小さいため、VALUEを除いたdictとして保持する
+        変換後のget_value_dfの変換内容はvalue_options(省略時は既定値)になる
+        """
+        if self.value_df is None:
+            value_options = self.value_options
+            self.value_df = self._get_section(("value_df", *value_options.values()), lambda: decode_value_list(
+                self._get_statistical_data().get("DATA_INF",{}).get("VALUE",[]), **value_options))
+        # 呼び出し元やキャッシュと共有している可能性があるため、元のdictは変更せずにコピーする
+        stat_data = dict(self.stat_data)
+        get_stats_data = dict(stat_data.get("GET_STATS_DATA",{}))
+        statistical_data = dict(get_stats_data.get("STATISTICAL_DATA",{}))
+        data_inf = {key: value for key, value in statistical_data.get("DATA_INF",{}).items() if key != "VALUE"}
+        statistical_data["DATA_INF"] = data_inf
+        get_stats_data["STATISTICAL_DATA"] = statistical_data
+        stat_data["GET_STATS_DATA"] = get_stats_data
+        self.stat_data = stat_data
+        # VALUEから変換したDataFrameはvalue_dfと重複するため破棄する
+        for key in [key for key in self._sections if isinstance(key, tuple) and key[0] == "value_df"]:
+            del self._sections[key]
+
+class JPEStatListData(_JPEStatSections):
     """
     日本の政府統計APIの統計表情報クラス
+    TABLE_INFは初回アクセス時に変換して保持し、2回目以降は変換しない
     """
-    def __init__(self, stat_list: dict ={}):
+    __slots__ = ("stat_list",)
+
+    def __init__(self, stat_list: dict ={}, hooks: list | None = None):
+        super().__init__(hooks)
         self.stat_list = stat_list
 
+    # TABLE_INFを変換したDataFrameを返す (保持しているDataFrameを返すため、変更しないこと)
+    def _get_table_inf_df(self) -> pd.DataFrame:
+        return self._get_section("table_inf_df", lambda: pd.json_normalize(
+            _as_list(self.stat_list.get("GET_STATS_LIST",{}).get("DATALIST_INF",{}).get("TABLE_INF",[]))))
+
     # 統計表情報からDataFrameを返す
     def get_df(self) -> pd.DataFrame:
         """
         3.2. 統計表情報取得
         """
         # DataFrameに変換
-        df = pd.json_normalize(self.stat_list.get("GET_STATS_LIST",{}).get("DATALIST_INF",{}).get("TABLE_INF",[]))   
-        # 列一覧を表示
-        print(df.columns.tolist())
+        df = self._get_table_inf_df().copy()
         return df
     
     def get_basic_info_df(self) -> pd.DataFrame:
@@ -115,8 +748,7 @@ class JPEStatListData:
         """
         
         # DataFrameに変換
-        # print(json.dumps(self.stat_list, indent=2, ensure_ascii=False))
-        df = pd.json_normalize(self.stat_list.get("GET_STATS_LIST",{}).get("DATALIST_INF",{}).get("TABLE_INF",{}))   
+        df = self._get_table_inf_df()
         # @id, STATISTICS_NAME, CYCLE, SURVEY_DATE, DESCRIPTIONを取得
         df = df[[
             "@id", "STATISTICS_NAME", "CYCLE", "SURVEY_DATE", "COLLECT_AREA", "DESCRIPTION", 
@@ -128,7 +760,7 @@ class JPEStatListData:
         """
         3.2. 統計表情報取得
         """
-        df = self.get_df()
+        df = self._get_table_inf_df()
         basic_info = df[["@id", "STATISTICS_NAME", "TITLE", "COLLECT_AREA", 
                          "STATISTICS_NAME_SPEC.TABULATION_CATEGORY", "STATISTICS_NAME_SPEC.TABULATION_SUB_CATEGORY1", 
                          "STATISTICS_NAME_SPEC.TABULATION_SUB_CATEGORY2", "STATISTICS_NAME_SPEC.TABULATION_SUB_CATEGORY3",
@@ -137,11 +769,22 @@ class JPEStatListData:
 
         return basic_info
 
-class JPEStatMetaData:
+    def release_raw(self):
+        """
+        TABLE_INFをDataFrameに変換し、レスポンスのdictを破棄する
+        """
+        self._get_table_inf_df()
+        self.stat_list = {}
+
+class JPEStatMetaData(_JPEStatSections):
     """
     日本の政府統計APIのメタ情報クラス
+    TABLE_INFは初回アクセス時に変換して保持し、2回目以降は変換しない
     """
-    def __init__(self, meta_data: dict ={}):
+    __slots__ = ("meta_data",)
+
+    def __init__(self, meta_data: dict ={}, hooks: list | None = None):
+        super().__init__(hooks)
         self.meta_data = meta_data
 
     # メタ情報からDataFrameを返す
@@ -150,11 +793,37 @@ class JPEStatMetaData:
         3.2. メタ情報取得
         """
         # DataFrameに変換
-        df = pd.json_normalize(self.meta_data.get("GET_META_INFO",{}).get("METADATA_INF",{}).get("TABLE_INF",[]))   
-        return df
+        df = self._get_section("table_inf_df", lambda: pd.json_normalize(
+            self.meta_data.get("GET_META_INFO",{}).get("METADATA_INF",{}).get("TABLE_INF",[])))
+        return df.copy()
+
+    def release_raw(self):
+        """
+        TABLE_INFをDataFrameに変換し、レスポンスのdictを破棄する
+        """
+        self.get_df()
+        self.meta_data = {}
 
 class JPEStatClient:
-    def __init__(self, app_id: str, lang: str = "J"):
+    # e-Stat API(バージョン3.0)のベースURL
+    BASE_URL = "https://api.e-stat.go.jp/rest/3.0/app"
+    # リトライ対象のHTTPステータスコード
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, app_id: str, lang: str = "J",
+                 base_url: str = BASE_URL,
+                 pool_size: int = 10,
+                 connect_timeout: float = 10.0,
+                 read_timeout: float = 120.0,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 backoff_max: float = 30.0,
+                 session: requests.Session | None = None,
+                 cache: JPEStatCache | None = None,
+                 csv_engine: str = "c",
+                 rate_limiter: JPEStatRateLimiter | None = None,
+                 coalesce_requests: bool = True,
+                 hooks: list | None = None):
         """"
         "3.1. 全API共通
         パラメータ名	意味	必須	設定内容・設定可能値
@@ -162,9 +831,209 @@ class JPEStatClient:
         lang	言語	－	取得するデータの言語を 以下のいずれかを指定して下さい。
         ・J：日本語 (省略値)
         ・E：英語"
+
+        通信設定
+        base_url: APIのベースURL
+        pool_size: コネクションプールのサイズ。複数スレッドから同時に利用する場合はスレッド数以上を指定する
+        connect_timeout: 接続タイムアウト(秒)
+        read_timeout: 読み込みタイムアウト(秒)
+        max_retries: 5xxエラー、タイムアウト、接続エラー時のリトライ回数
+        backoff_factor: リトライ間隔の基準値(秒)。backoff_factor * 2^試行回数 を上限としたランダムな時間待機する
+        backoff_max: リトライ間隔の上限(秒)
+        session: 利用するrequests.Session。省略時はコネクションプールを設定したSessionを作成する
+        cache: レスポンスをキャッシュするJPEStatCache。省略時はキャッシュしない
+        (キャッシュが保持しているdictを返す場合があるため、戻り値のdictは変更しないこと)
+        csv_engine: CSV形式の統計データを読み込むpandas.read_csvのengine ("c" または "pyarrow")
+        rate_limiter: リクエスト数を制限するJPEStatRateLimiter。複数のクライアント、プロセスで共有できる
+        coalesce_requests: Trueの場合、同じパラメータのJSON APIの呼び出しが同時に行われたときに1回のリクエストにまとめる
+        (まとめられた呼び出し元には同じdictを返すため、戻り値のdictは変更しないこと)
+        hooks: 計測結果のイベント(dict)を受け取る関数のリスト。JPEStatMetricsを指定すると集計できる
+        (イベントの内容はjpestat_metricsを参照。作成したJPEStatData等にも引き継ぎ、DataFrameへの変換時間を通知する)
         """
         self.app_id = app_id
         self.lang = lang
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.session = session
+        self.cache = cache
+        self.csv_engine = csv_engine
+        self.rate_limiter = rate_limiter
+        self._single_flight = _SingleFlight() if coalesce_requests else None
+        self.hooks = list(hooks) if hooks is not None else []
+
+    def close(self):
+        """
+        Sessionを閉じてコネクションプールを解放する
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # 呼び出し元のparamsを変更せずに、全API共通のパラメータを付与したパラメータを作成する
+    def _build_params(self, params: dict) -> dict:
+        request_params = dict(params)
+        request_params["appId"] = self.app_id
+        request_params["lang"] = self.lang
+        return request_params
+
+    # リトライ間隔(秒)を計算する
+    def _get_backoff(self, attempt: int) -> float:
+        return _get_backoff(attempt, self.backoff_factor, self.backoff_max)
+
+    # APIを呼び出してレスポンスを返す
+    def _get(self, path: str, params: dict, decode=None, **kwargs):
+        """
+        429(リクエスト過多)、5xxエラー、タイムアウト、接続エラーの場合はmax_retries回までリトライする
+        429、503でRetry-Afterヘッダ(秒)が返された場合は、その時間以上待機する
+        rate_limiterが設定されている場合は、リトライを含む各リクエストの前にトークンを取得する
+        hooksが設定されている場合は、リトライを含む各リクエストごとにrequestイベントを通知する
+        path: ベースURLからの相対パス (例: json/getStatsData)
+        decode: レスポンスを変換する関数。指定した場合は変換結果を返し、変換時間も計測する。省略時はResponseを返す
+        (stream=Trueの場合、本文の受信は変換と同時に行われるため、変換時間に含まれる)
+        """
+        url = f"{self.base_url}/{path}"
+        request_params = self._build_params(params)
+        event = {"event": "request", "endpoint": path.rsplit("/", 1)[-1]}
+        if self.hooks:
+            event["params_hash"] = make_request_key(event["endpoint"], request_params)
+        attempt = 0
+        while True:
+            wait = self._get_backoff(attempt)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=request_params, timeout=self.timeout, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._emit_request(event, attempt, None, started, error=e)
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status_code == 200:
+                    return self._decode_response(event, attempt, response, started, decode)
+                self._emit_request(event, attempt, response, started)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    raise Exception(f"Unexpected status code: {response.status_code}")
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    wait = max(wait, float(retry_after))
+                response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    # 正常なレスポンスをdecodeで変換し、requestイベントを通知する
+    def _decode_response(self, event: dict, attempt: int, response: requests.Response, started: float, decode):
+        if decode is None:
+            self._emit_request(event, attempt, response, started)
+            return response
+        downloaded = time.perf_counter()
+        try:
+            result = decode(response)
+        except Exception as e:
+            self._emit_request(event, attempt, response, started, downloaded=downloaded, error=e)
+            raise
+        data = result[0] if isinstance(result, tuple) else result
+        self._emit_request(event, attempt, response, started, downloaded=downloaded,
+                           result_status=_get_result_status(data) if isinstance(data, dict) else None)
+        return result
+
+    # 1回のHTTPリクエストの計測結果をrequestイベントとして通知する
+    def _emit_request(self, event: dict, attempt: int, response: requests.Response | None, started: float,
+                      downloaded: float | None = None, result_status: int | None = None, error: Exception | None = None):
+        if not self.hooks:
+            return
+        now = time.perf_counter()
+        event = dict(event, attempt=attempt, http_status=None, bytes=0, ttfb=None, download_time=None,
+                     decode_time=None, result_status=result_status, error=type(error).__name__ if error is not None else None)
+        if response is not None:
+            # elapsedはリクエスト送信からレスポンスヘッダの受信までの時間
+            ttfb = response.elapsed.total_seconds()
+            received = downloaded if downloaded is not None else now
+            event.update(
+                http_status=response.status_code,
+                bytes=_get_response_bytes(response),
+                ttfb=ttfb,
+                download_time=max(0.0, received - started - ttfb),
+                decode_time=now - downloaded if downloaded is not None else None,
+            )
+        _emit(self.hooks, event)
+
+    # APIを呼び出してJSONをdictで返す
+    def _get_json(self, endpoint: str, params: dict) -> dict:
+        """
+        coalesce_requestsがTrueの場合、同じパラメータで実行中の呼び出しがあれば、その結果を待って返す
+        endpoint: API名 (例: getStatsData)
+        """
+        if self._single_flight is None:
+            return self._fetch_json(endpoint, params)
+        key = make_request_key(endpoint, self._build_params(params))
+        return self._single_flight.do(key, lambda: self._fetch_json(endpoint, params))
+
+    # APIを呼び出してJSONをdictで返す
+    def _fetch_json(self, endpoint: str, params: dict) -> dict:
+        """
+        cacheが設定されている場合は、有効なキャッシュがあれば通信せずにキャッシュを返す
+        有効期間を過ぎたキャッシュは、統計表の更新日付が変わっていなければ再利用する
+        endpoint: API名 (例: getStatsData)
+        """
+        if self.cache is None:
+            return self._get(f"json/{endpoint}", params=params, decode=_decode_json)
+
+        cache_params = self._build_params(params)
+        data, fresh, updated_date = self.cache.get(endpoint, cache_params)
+        if data is not None:
+            if fresh:
+                self._emit_cache(endpoint, cache_params, "hit")
+                return data
+            if self.cache.revalidate and updated_date is not None \
+                    and self._get_updated_date(params) == updated_date:
+                self.cache.touch(endpoint, cache_params)
+                self._emit_cache(endpoint, cache_params, "revalidated")
+                return data
+
+        self._emit_cache(endpoint, cache_params, "miss")
+        data = self._get(f"json/{endpoint}", params=params, decode=_decode_json)
+        # エラー(STATUSが100以上)のレスポンスはキャッシュしない
+        if _get_result_status(data) < 100:
+            self.cache.put(endpoint, cache_params, data)
+        return data
+
+    # キャッシュの参照結果をcacheイベントとして通知する
+    def _emit_cache(self, endpoint: str, cache_params: dict, result: str):
+        if self.hooks:
+            _emit(self.hooks, {"event": "cache", "endpoint": endpoint,
+                               "params_hash": make_request_key(endpoint, cache_params), "result": result})
+
+    # 統計表の最終更新日付を取得する
+    def _get_updated_date(self, params: dict) -> str | None:
+        """
+        件数のみ(cntGetFlg=Y)、メタ情報なしで統計データを取得し、TABLE_INF.UPDATED_DATEを返す
+        statsDataIdが指定されていない場合はNone
+        """
+        if "statsDataId" not in params:
+            return None
+        check_params = {
+            "statsDataId": params["statsDataId"],
+            "cntGetFlg": "Y",
+            "metaGetFlg": "N",
+            "explanationGetFlg": "N",
+        }
+        data = self._get("json/getStatsData", params=check_params, decode=_decode_json)
+        return get_updated_date("getStatsData", data)
 
     # 2 統計表情報取得
     def get_stat_list_json(self, params: dict ={}) -> dict:
@@ -214,16 +1083,7 @@ class JPEStatClient:
         コールバックされる関数名を指定して下さい。
         """
 
-        url = "https://api.e-stat.go.jp/rest/3.0/app/json/getStatsList"
-        params["appId"] = self.app_id
-        params["lang"] = self.lang
-        
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.raise_for_status())
+        return self._get_json("getStatsList", params=params)
 
     # 統計表データを取得してJPEStatListDataクラスを返す
     def get_stat_list_object(self, params: dict ={}) -> JPEStatListData:
@@ -233,7 +1093,31 @@ class JPEStatClient:
         stat_list = self.get_stat_list_json(params=params)
         # print(json.dumps(stat_list, indent=2, ensure_ascii=False))
         # JPEStatListDataクラスに変換
-        return JPEStatListData(stat_list=stat_list)
+        return JPEStatListData(stat_list=stat_list, hooks=self.hooks)
+
+    # 統計表情報をNEXT_KEYに従ってページ単位で取得する
+    def iter_stat_list_json(self, params: dict ={}) -> Iterator[dict]:
+        """
+        3.2. 統計表情報取得
+        RESULT_INF.NEXT_KEYをstartPositionに指定して継続データを順に取得し、1ページ分のdictをyieldする
+        """
+        page_params = dict(params)
+        while True:
+            stat_list = self.get_stat_list_json(params=page_params)
+            next_key = _get_stat_list_next_key(stat_list)
+            yield stat_list
+            if not next_key:
+                break
+            page_params["startPosition"] = next_key
+
+    # 統計表情報を全件取得してJPEStatListDataクラスを返す
+    def get_stat_list_all_object(self, params: dict ={}) -> JPEStatListData:
+        """
+        3.2. 統計表情報取得
+        継続データを含めて全件を取得し、1つのJPEStatListDataに結合する
+        """
+        stat_list = concat_stat_list_json(self.iter_stat_list_json(params=params))
+        return JPEStatListData(stat_list=stat_list, hooks=self.hooks)
     # 3 メタ情報取得    
     def get_meta_info_json(self, params: dict ={}) -> dict:
         """
@@ -248,16 +1132,7 @@ class JPEStatClient:
         省略時は指定しません。 
         """
         
-        url = "https://api.e-stat.go.jp/rest/3.0/app/json/getMetaInfo"
-        params["appId"] = self.app_id
-        params["lang"] = self.lang
-        
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.raise_for_status())
+        return self._get_json("getMetaInfo", params=params)
 
     # メタ情報を取得してDataFrameを返す
     def get_meta_info_object(self, params: dict ={}) -> JPEStatMetaData:
@@ -266,7 +1141,7 @@ class JPEStatClient:
         """
         meta_info = self.get_meta_info_json(params=params)
         # JPEStatMetaDataクラスに変換
-        return JPEStatMetaData(meta_data=meta_info)
+        return JPEStatMetaData(meta_data=meta_info, hooks=self.hooks)
     
     # 4 統計データ取得
     def get_stat_data_json(self, params: dict ={}) -> dict:
@@ -332,26 +1207,245 @@ class JPEStatClient:
         ・1：セクションヘッダを出力する (省略値)
         ・2：セクションヘッダを取得しない
         """
-        url = "https://api.e-stat.go.jp/rest/3.0/app/json/getStatsData"
-        params["appId"] = self.app_id
-        params["lang"] = self.lang
-        
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.raise_for_status())
+        return self._get_json("getStatsData", params=params)
 
     # 統計データを取得してJPEStatDataクラスを返す
-    def get_stat_data_object(self, params: dict ={}) -> JPEStatData:
+    def get_stat_data_object(self, params: dict ={}, low_memory: bool = False, data_format: str = "json",
+                             value_options: dict | None = None) -> JPEStatData:
         
         """
         3.4. 統計データ取得
+        low_memory: Trueの場合、レスポンスを逐次的に読み込み、VALUEをdictとして保持せずにDataFrameに変換する
+        (キャッシュは使用しない)
+        data_format: "csv"の場合、CSV形式(getSimpleStatsData)で取得し、JSON形式と同じ構造に変換する
+        (キャッシュは使用しない。metaGetFlg、cntGetFlgは無効。CLASS_INFはVALUEのコードと名称から作成する)
+        value_options: VALUEの変換内容 (get_value_dfのnumeric、categorical、flag_special)
+        get_column_modified_values_df、release_rawはこの内容で変換する
         """
+        if data_format == "csv":
+            return self._get_stat_data_object_csv(params=params, value_options=value_options)
+        if low_memory:
+            return self._get_stat_data_object_low_memory(params=params, value_options=value_options)
         stat_data = self.get_stat_data_json(params=params)
         # JPEStatDataクラスに変換
-        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data)
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data, hooks=self.hooks,
+                           value_options=_get_value_options(value_options))
+
+    # 統計データを逐次的に読み込んでJPEStatDataクラスを返す
+    def _get_stat_data_object_low_memory(self, params: dict, value_options: dict | None = None) -> JPEStatData:
+        value_options = _get_value_options(value_options)
+        stat_data, value_df = self._get("json/getStatsData", params=params, stream=True,
+                                        decode=lambda response: _decode_stat_data_stream(response, value_options))
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data, value_df=value_df, hooks=self.hooks,
+                           value_options=value_options)
+
+    # CSV形式で統計データを取得してJPEStatDataクラスを返す
+    def _get_stat_data_object_csv(self, params: dict, value_options: dict | None = None) -> JPEStatData:
+        value_options = _get_value_options(value_options)
+        csv_params = dict(params)
+        # NEXT_KEYを取得するため、省略時はセクションヘッダを出力する
+        csv_params.setdefault("sectionHeaderFlg", "1")
+        section_header = str(csv_params["sectionHeaderFlg"]) != "2"
+        stat_data, value_df = self._get("getSimpleStatsData", params=csv_params,
+                                        decode=lambda response: parse_simple_stat_data_csv(
+                                            response.content, engine=self.csv_engine, section_header=section_header,
+                                            **value_options))
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data, value_df=value_df, hooks=self.hooks,
+                           value_options=value_options)
+
+    # 統計データをNEXT_KEYに従ってページ単位で取得する
+    def iter_stat_data_json(self, params: dict ={}) -> Iterator[dict]:
+        """
+        3.4. 統計データ取得
+        RESULT_INF.NEXT_KEYをstartPositionに指定して継続データを順に取得し、1ページ分のdictをyieldする
+        保持するのは1ページ分のみのため、limit(省略時10万件)を超える統計表でもメモリ使用量は1ページ分に収まる
+        """
+        page_params = dict(params)
+        while True:
+            stat_data = self.get_stat_data_json(params=page_params)
+            next_key = _get_stat_data_next_key(stat_data)
+            yield stat_data
+            if not next_key:
+                break
+            page_params["startPosition"] = next_key
+
+    # 統計データをNEXT_KEYに従ってページ単位で取得し、JSONをバイト列のまま返す
+    def iter_stat_data_raw(self, params: dict ={}) -> Iterator[bytes]:
+        """
+        3.4. 統計データ取得
+        JSONをdictに変換せずに1ページ分のバイト列をyieldする (別プロセスで変換する場合等)
+        キャッシュ、同時リクエストの集約(coalesce_requests)は使用しない
+        NEXT_KEYはRESULT_INFまでを読み込んで取得する
+        """
+        page_params = dict(params)
+        while True:
+            content = self._get("json/getStatsData", params=page_params, decode=_decode_content)
+            next_key = _peek_stat_data_next_key(content)
+            yield content
+            if not next_key:
+                break
+            page_params["startPosition"] = next_key
+
+    # 統計データをページ単位で取得してJPEStatDataクラスを返す
+    def iter_stat_data_object(self, params: dict ={}, low_memory: bool = False, data_format: str = "json",
+                              value_options: dict | None = None) -> Iterator[JPEStatData]:
+        """
+        3.4. 統計データ取得
+        1ページ分ずつJPEStatDataをyieldする
+        low_memory, data_format, value_options: get_stat_data_objectと同様
+        (data_format="csv"でsectionHeaderFlg=2を指定した場合はNEXT_KEYを取得できないため、1ページ分のみとなる)
+        """
+        if not low_memory and data_format != "csv":
+            value_options = _get_value_options(value_options)
+            for stat_data in self.iter_stat_data_json(params=params):
+                yield JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data, hooks=self.hooks,
+                                  value_options=value_options)
+            return
+
+        page_params = dict(params)
+        while True:
+            stat_data_object = self.get_stat_data_object(params=page_params, low_memory=low_memory, data_format=data_format,
+                                                         value_options=value_options)
+            next_key = _get_stat_data_next_key(stat_data_object.stat_data)
+            yield stat_data_object
+            if not next_key:
+                break
+            page_params["startPosition"] = next_key
+
+    # 統計データをページ単位で取得してVALUEのDataFrameを返す
+    def iter_stat_data_value_df(self, params: dict ={}, low_memory: bool = False, data_format: str = "json",
+                                value_options: dict | None = None) -> Iterator[pd.DataFrame]:
+        """
+        3.4. 統計データ取得
+        1ページ分ずつVALUEのDataFrameをyieldする
+        value_options: VALUEの変換内容 (get_value_dfのnumeric、categorical、flag_special)
+        """
+        value_options = _get_value_options(value_options)
+        for stat_data_object in self.iter_stat_data_object(params=params, low_memory=low_memory, data_format=data_format,
+                                                           value_options=value_options):
+            yield stat_data_object.get_value_df(**value_options)
+
+    # 統計データを全件取得してJPEStatDataクラスを返す
+    def get_stat_data_all_object(self, params: dict ={}, low_memory: bool = False, data_format: str = "json",
+                                 value_options: dict | None = None) -> JPEStatData:
+        """
+        3.4. 統計データ取得
+        継続データを含めて全件を取得し、1つのJPEStatDataに結合する
+        low_memory, data_format, value_options: get_stat_data_objectと同様
+        """
+        value_options = _get_value_options(value_options)
+        if not low_memory and data_format != "csv":
+            stat_data = concat_stat_data_json(self.iter_stat_data_json(params=params))
+            return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data, hooks=self.hooks,
+                               value_options=value_options)
+
+        pages = []
+        chunks = []
+        class_obj_lists = []
+        for stat_data_object in self.iter_stat_data_object(params=params, low_memory=low_memory, data_format=data_format,
+                                                           value_options=value_options):
+            pages.append(stat_data_object.stat_data)
+            chunks.append(stat_data_object.value_df)
+            class_obj_lists.append(stat_data_object.stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("CLASS_INF",{}).get("CLASS_OBJ",[]))
+        stat_data = concat_stat_data_json(pages)
+        if data_format == "csv" and "STATISTICAL_DATA" in stat_data.get("GET_STATS_DATA",{}):
+            # CSV形式のCLASS_INFはページ内のVALUEから作成しているため、全ページ分を統合する
+            stat_data["GET_STATS_DATA"]["STATISTICAL_DATA"]["CLASS_INF"] = {"CLASS_OBJ": merge_class_obj(class_obj_lists)}
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data,
+                           value_df=concat_value_df(chunks), hooks=self.hooks, value_options=value_options)
+
+    # 統計データを全件取得してVALUEのDataFrameを返す
+    def get_stat_data_all_value_df(self, params: dict ={}, low_memory: bool = False, data_format: str = "json",
+                                   value_options: dict | None = None) -> pd.DataFrame:
+        """
+        3.4. 統計データ取得
+        継続データを含めて全件を取得し、ページごとのDataFrameを連結する
+        """
+        return concat_value_df(self.iter_stat_data_value_df(params=params, low_memory=low_memory, data_format=data_format,
+                                                             value_options=value_options))
+
+    # 統計データの件数を取得する
+    def count_stat_data(self, params: dict ={}) -> int:
+        """
+        3.4. 統計データ取得
+        cntGetFlg=Yを指定して、統計データを取得せずに件数(RESULT_INF.TOTAL_NUMBER)のみを取得する
+        """
+        count_params = {key: value for key, value in params.items() if key not in ("startPosition", "limit")}
+        count_params.update({"cntGetFlg": "Y", "metaGetFlg": "N", "explanationGetFlg": "N"})
+        stat_data = self.get_stat_data_json(params=count_params)
+        total_number = stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("RESULT_INF",{}).get("TOTAL_NUMBER", 0)
+        return int(total_number)
+
+    # 統計データの取得を件数の上限以下の複数のリクエストに分割する
+    def plan_stat_data_slices(self, params: dict ={}, max_rows: int = 100_000) -> list[dict]:
+        """
+        3.4. 統計データ取得
+        件数(cntGetFlg=Y)とメタ情報のCLASS_INFから、各リクエストの推定件数がmax_rows以下になるように
+        cdTime、cdArea、cdCat01～15、cdTabで絞り込んだパラメータのlistを作成する
+        各パラメータの結果は重複しないため、独立に(並行して)取得できる
+        paramsで既に絞り込まれている事項(cdXxx、lvXxx)は分割に使用しない
+        全件を分割するため、startPosition、cntGetFlgは各パラメータに含めない
+        max_rows: 1リクエストの件数の上限 (e-Statのlimitの省略値は10万件)
+        """
+        total = self.count_stat_data(params=params)
+        params = {key: value for key, value in params.items() if key not in ("startPosition", "cntGetFlg")}
+        if total <= max_rows:
+            return [params]
+
+        meta_info = self.get_meta_info_json(params={"statsDataId": params["statsDataId"], "explanationGetFlg": "N"})
+        class_obj_list = _as_list(meta_info.get("GET_META_INFO",{}).get("METADATA_INF",{}).get("CLASS_INF",{}).get("CLASS_OBJ"))
+        dimensions = []
+        for class_obj in class_obj_list:
+            class_id = class_obj.get("@id", "")
+            name = class_id[:1].upper() + class_id[1:]
+            if any(key.startswith(("cd" + name, "lv" + name)) for key in params):
+                continue
+            codes = [class_data.get("@code") for class_data in _as_list(class_obj.get("CLASS"))]
+            if len(codes) >= 2:
+                dimensions.append((name, codes))
+        # コード数の多い事項から分割する
+        dimensions.sort(key=lambda dimension: len(dimension[1]), reverse=True)
+        return _split_stat_data_params(params, total, dimensions, max_rows)
+
+    # 分割した統計データを1つ取得する
+    def _get_stat_data_slice(self, params: dict, low_memory: bool, value_options: dict) -> tuple[dict, pd.DataFrame]:
+        # 推定件数を超えた場合もNEXT_KEYに従って全件取得する
+        stat_data_object = self.get_stat_data_all_object(params=params, low_memory=low_memory, value_options=value_options)
+        value_df = stat_data_object.get_value_df(**value_options).drop(columns=["statsDataId"])
+        stat_data_object.release_raw()
+        return stat_data_object.stat_data, value_df
+
+    # 統計データを分割して並行に取得し、1つのJPEStatDataに結合する
+    def get_stat_data_parallel_object(self, params: dict ={}, max_rows: int = 100_000, max_workers: int = 4,
+                                      low_memory: bool = False, value_options: dict | None = None) -> JPEStatData:
+        """
+        3.4. 統計データ取得
+        plan_stat_data_slicesで分割したリクエストをmax_workers個のスレッドで並行に取得して結合する
+        結合結果はコード列で重複を除き、コード列の順に並べ替えるため、分割方法や取得順によらず同じ結果になる
+        max_workers: 並行して取得するリクエスト数 (pool_size以下を指定する)
+        low_memory, value_options: get_stat_data_objectと同様
+        """
+        value_options = _get_value_options(value_options)
+        slices = self.plan_stat_data_slices(params=params, max_rows=max_rows)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda slice_params: self._get_stat_data_slice(slice_params, low_memory, value_options), slices))
+
+        value_df = concat_value_df(value_df for _, value_df in results)
+        key_columns = [column for column in value_df.columns if column.startswith("@") and column not in ("@unit", "@annotation")]
+        if len(key_columns) > 0:
+            value_df = value_df.drop_duplicates(subset=key_columns).sort_values(key_columns, kind="stable").reset_index(drop=True)
+
+        stat_data = results[0][0] if len(results) > 0 else {}
+        statistical_data = stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{})
+        if statistical_data:
+            class_obj_lists = [
+                result.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("CLASS_INF",{}).get("CLASS_OBJ",[])
+                for result, _ in results]
+            statistical_data["CLASS_INF"] = {"CLASS_OBJ": merge_class_obj(class_obj_lists)}
+            statistical_data["RESULT_INF"] = {"TOTAL_NUMBER": len(value_df), "FROM_NUMBER": 1, "TO_NUMBER": len(value_df)}
+        return JPEStatData(stats_data_id=params["statsDataId"], stat_data=stat_data, value_df=value_df, hooks=self.hooks,
+                           value_options=value_options)
 
     
 def init_env():
@@ -0,0 +1,149 @@
+import bisect
+import threading
+
+'''
+JPEStatClientの計測結果(hooksに通知されるイベント)を集計するクラス
+集計結果はPrometheusのテキスト形式(text/plain; version=0.0.4)で出力する
+
+イベントはdictで、eventキーの値によって次の項目を持つ
+  request: API呼び出し(リトライを含む1回のHTTPリクエスト)ごと
+    endpoint, params_hash, attempt, http_status, bytes, ttfb, download_time, decode_time, result_status, error
+  cache: キャッシュを参照したとき
+    endpoint, params_hash, result (hit, revalidated, miss)
+  convert: JPEStatData等のgetterでdictをDataFrame等に変換したとき
+    class, section, rows, conversion_time
+'''
+
+# メトリクス名(接頭辞を除く)ごとの種類と説明
+_METRICS = {
+    "requests_total": ("counter", "Number of HTTP requests to the e-Stat API."),
+    "request_errors_total": ("counter", "Number of HTTP requests that failed without a response."),
+    "response_bytes_total": ("counter", "Bytes received from the e-Stat API."),
+    "request_ttfb_seconds": ("histogram", "Time to first byte (until the response headers were received)."),
+    "request_download_seconds": ("histogram", "Time to download the response body."),
+    "request_decode_seconds": ("histogram", "Time to decode the response body (JSON, CSV or streaming parse)."),
+    "cache_requests_total": ("counter", "Number of response cache lookups."),
+    "conversion_seconds": ("histogram", "Time to convert a response section into a DataFrame."),
+    "conversion_rows_total": ("counter", "Number of rows produced by DataFrame conversions."),
+}
+
+# ラベルの値をエスケープする
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labels: tuple) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class JPEStatMetrics:
+    """
+    JPEStatClientのhooksに指定して、リクエストとDataFrame変換の計測結果を集計するクラス
+    例: metrics = JPEStatMetrics(); client = JPEStatClient(app_id, hooks=[metrics]); print(metrics.to_prometheus())
+    """
+    # ヒストグラムのバケットの上限(秒)の既定値
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, prefix: str = "jpestat", buckets: tuple | None = None):
+        """
+        prefix: メトリクス名の接頭辞
+        buckets: ヒストグラムのバケットの上限(秒)。省略時はDEFAULT_BUCKETS
+        """
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets if buckets is not None else self.DEFAULT_BUCKETS))
+        self._lock = threading.Lock()
+        self._counters: dict = {}
+        self._histograms: dict = {}
+
+    def __call__(self, event: dict):
+        """
+        イベントを集計する
+        """
+        with self._lock:
+            kind = event.get("event")
+            if kind == "request":
+                self._record_request(event)
+            elif kind == "cache":
+                self._inc("cache_requests_total", (("endpoint", event.get("endpoint")), ("result", event.get("result"))))
+            elif kind == "convert":
+                labels = (("class", event.get("class")), ("section", event.get("section")))
+                self._observe("conversion_seconds", labels, event.get("conversion_time", 0.0))
+                if event.get("rows") is not None:
+                    self._inc("conversion_rows_total", labels, event["rows"])
+
+    def _record_request(self, event: dict):
+        endpoint = (("endpoint", event.get("endpoint")),)
+        if event.get("http_status") is None:
+            self._inc("request_errors_total", endpoint + (("error", event.get("error")),))
+            return
+        result_status = event.get("result_status")
+        self._inc("requests_total", endpoint + (
+            ("http_status", event["http_status"]),
+            ("result_status", "" if result_status is None else result_status)))
+        self._inc("response_bytes_total", endpoint, event.get("bytes", 0))
+        for name, key in (("request_ttfb_seconds", "ttfb"),
+                          ("request_download_seconds", "download_time"),
+                          ("request_decode_seconds", "decode_time")):
+            if event.get(key) is not None:
+                self._observe(name, endpoint, event[key])
+
+    def _inc(self, name: str, labels: tuple, value: float = 1):
+        key = (name, tuple((label, str(label_value)) for label, label_value in labels))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name: str, labels: tuple, value: float):
+        key = (name, tuple((label, str(label_value)) for label, label_value in labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            # [バケットごとの件数, 合計, 件数]
+            histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            histogram[0][index] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    def reset(self):
+        """
+        集計結果を破棄する
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """
+        集計結果をPrometheusのテキスト形式で返す
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(value[0]), value[1], value[2]) for key, value in self._histograms.items()}
+
+        lines = []
+        for name, (metric_type, help_text) in _METRICS.items():
+            full_name = f"{self.prefix}_{name}"
+            if metric_type == "counter":
+                samples = sorted((labels, value) for (metric, labels), value in counters.items() if metric == name)
+            else:
+                samples = sorted((labels, value) for (metric, labels), value in histograms.items() if metric == name)
+            if len(samples) == 0:
+                continue
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in samples:
+                if metric_type == "counter":
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                bucket_counts, total, count = value
+                cumulative = 0
+                for upper, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts + [count - sum(bucket_counts)]):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', _format_value(upper)),))} {cumulative}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
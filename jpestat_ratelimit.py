@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import threading
+import time
+
+'''
+日本の政府統計APIへのリクエスト数を制限するトークンバケット
+JPEStatClientのrate_limiter引数に指定して利用する
+pathを指定した場合はSQLiteファイルで状態を共有し、同じファイルを指定した複数のプロセスで合計のリクエスト数を制限する
+'''
+
+class JPEStatRateLimiter:
+    """
+    トークンバケットによるリクエスト数の制限クラス
+    1秒あたりrate個のトークンを補充し(最大burst個)、リクエストごとに1個消費する
+    """
+    def __init__(self, rate: float = 5.0, burst: int = 10, path: str | None = None):
+        """
+        rate: 1秒あたりのリクエスト数の上限(持続値)
+        burst: 連続して送信できるリクエスト数の上限
+        path: 状態を共有するSQLiteファイルのパス。省略時はプロセス内(スレッド間)でのみ共有する
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.path = path
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated_at = time.time()
+        self._local = threading.local()
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+                conn.execute("INSERT OR IGNORE INTO bucket (id, tokens, updated_at) VALUES (1, ?, ?)", (float(self.burst), time.time()))
+
+    # スレッドごとにSQLiteの接続を作成する
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # トランザクションはBEGIN IMMEDIATEで明示的に開始する
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    # トークンを1個消費する。戻り値は(残りのトークン数, 更新日時, 待ち時間(秒))
+    # 不足している場合の待ち時間は、次のトークンが補充されるまでの時間
+    def _take(self, tokens: float, updated_at: float) -> tuple[float, float, float]:
+        # 時刻はロックの取得後に読み、更新日時を過去に戻さない
+        # (ロック待ちの間に他の呼び出し元が更新した場合に、同じ補充期間を二重に数えないようにする)
+        now = max(time.time(), updated_at)
+        tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate)
+        if tokens >= 1.0:
+            return tokens - 1.0, now, 0.0
+        return tokens, now, (1.0 - tokens) / self.rate
+
+    def _try_acquire(self) -> float:
+        if self.path is None:
+            with self._lock:
+                self._tokens, self._updated_at, wait = self._take(self._tokens, self._updated_at)
+                return wait
+
+        conn = self._connect()
+        # BEGIN IMMEDIATEで書き込みロックを取得し、プロセス間で排他制御する
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM bucket WHERE id = 1").fetchone()
+            tokens, updated_at, wait = self._take(row[0], row[1])
+            conn.execute("UPDATE bucket SET tokens = ?, updated_at = ? WHERE id = 1", (tokens, updated_at))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self):
+        """
+        トークンを1個取得する。トークンがない場合は補充されるまで待機する
+        """
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
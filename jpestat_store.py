@@ -0,0 +1,238 @@
+import datetime
+import json
+import os
+import shutil
+import uuid
+
+import pandas as pd # type: ignore[import]
+import pyarrow as pa # type: ignore[import]
+import pyarrow.dataset as pa_dataset # type: ignore[import]
+import pyarrow.parquet as pq # type: ignore[import]
+
+from jpestat_client import JPEStatClient, JPEStatData, _as_list
+
+'''
+日本の政府統計APIの統計データをローカルにParquet形式で保存するクラス
+統計表ごとにVALUEを時間軸コード(@time)で分割したParquetデータセットとして保存し、
+TABLE_INF、CLASS_INFをメタ情報として保存する
+'''
+
+# VALUEの分割に使用する列
+PARTITION_COLUMN = "@time"
+# コード列以外のVALUEの列
+_VALUE_ATTR_COLUMNS = ("@unit", "$", "@annotation")
+
+def _get_value_schema(stat_data: dict) -> pa.Schema:
+    """
+    統計表のVALUEのParquetのスキーマを返す
+    ページごとに列の有無や$列の型(Int64/Float64)が異なっても同じスキーマで書き込めるよう、CLASS_INFから作成する
+    コード列(@+CLASS_OBJの@id)、@unit、@annotationは文字列、$は浮動小数点数
+    """
+    class_obj_list = _as_list(stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{}).get("CLASS_INF",{}).get("CLASS_OBJ"))
+    names = ["@" + class_obj["@id"] for class_obj in class_obj_list]
+    names.extend(name for name in _VALUE_ATTR_COLUMNS if name not in names)
+    return pa.schema([(name, pa.float64() if name == "$" else pa.string()) for name in names])
+
+class JPEStatStore:
+    """
+    日本の政府統計APIの統計データのローカルストア
+    ディレクトリ構成
+    root/
+      store.json                       ストア全体の情報 (最終同期日)
+      <statsDataId>/
+        meta.json                      取得パラメータ、更新日付、VALUEを除いた統計データ(TABLE_INF、CLASS_INF等)
+        values/@time=<時間軸コード>/    VALUEのParquetファイル
+    """
+    def __init__(self, root: str = "jpestat_store", client: JPEStatClient | None = None):
+        """
+        root: ストアのディレクトリ
+        client: 統計データの取得に使用するJPEStatClient。読み込みのみの場合は省略可
+        """
+        self.root = root
+        self.client = client
+        os.makedirs(root, exist_ok=True)
+
+    def _get_table_dir(self, stats_data_id: str) -> str:
+        return os.path.join(self.root, stats_data_id)
+
+    def _get_values_dir(self, stats_data_id: str) -> str:
+        return os.path.join(self._get_table_dir(stats_data_id), "values")
+
+    def _get_meta_path(self, stats_data_id: str) -> str:
+        return os.path.join(self._get_table_dir(stats_data_id), "meta.json")
+
+    # JSONファイルを一時ファイル経由で書き込む
+    def _write_json(self, path: str, data: dict):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _get_client(self) -> JPEStatClient:
+        if self.client is None:
+            raise ValueError("client is not set.")
+        return self.client
+
+    def list_stats_data_ids(self) -> list[str]:
+        """
+        保存されている統計表IDの一覧を返す
+        """
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self._get_meta_path(name)))
+
+    def get_meta(self, stats_data_id: str) -> dict:
+        """
+        統計表のメタ情報(meta.json)を返す。保存されていない場合は空のdict
+        """
+        return self._read_json(self._get_meta_path(stats_data_id))
+
+    def download(self, stats_data_id: str, params: dict | None = None) -> int:
+        """
+        統計データを取得して保存する。保存済みの場合は置き換える
+        NEXT_KEYに従ってページ単位で取得し、ページごとにParquetファイルを書き込むため、メモリ使用量は1ページ分に収まる
+        params: 統計データ取得のパラメータ。省略時は前回保存時のパラメータを使用する
+        戻り値: 保存した行数
+        """
+        client = self._get_client()
+        if params is None:
+            params = self.get_meta(stats_data_id).get("params", {})
+        params = dict(params, statsDataId=stats_data_id)
+
+        table_dir = self._get_table_dir(stats_data_id)
+        os.makedirs(table_dir, exist_ok=True)
+        # 一時ディレクトリに書き込んでから置き換え、読み込み中のデータを壊さない
+        tmp_dir = os.path.join(table_dir, f"values.{uuid.uuid4().hex}.tmp")
+        os.makedirs(tmp_dir)
+        stat_data: dict = {}
+        schema: pa.Schema | None = None
+        rows = 0
+        try:
+            for page, stat_data_object in enumerate(client.iter_stat_data_object(params=params, low_memory=True)):
+                if not stat_data:
+                    stat_data = stat_data_object.stat_data
+                    schema = _get_value_schema(stat_data)
+                value_df = stat_data_object.value_df
+                if value_df is None or len(value_df) == 0:
+                    continue
+                self._write_values(value_df, tmp_dir, page, schema)
+                rows += len(value_df)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        values_dir = self._get_values_dir(stats_data_id)
+        old_dir = None
+        if os.path.exists(values_dir):
+            old_dir = os.path.join(table_dir, f"values.{uuid.uuid4().hex}.old")
+            os.replace(values_dir, old_dir)
+        os.replace(tmp_dir, values_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+        statistical_data = stat_data.get("GET_STATS_DATA",{}).get("STATISTICAL_DATA",{})
+        statistical_data.pop("RESULT_INF", None)
+        self._write_json(self._get_meta_path(stats_data_id), {
+            "statsDataId": stats_data_id,
+            "params": {key: value for key, value in params.items() if key not in ("statsDataId", "startPosition")},
+            "updated_date": statistical_data.get("TABLE_INF",{}).get("UPDATED_DATE"),
+            "synced_at": datetime.date.today().strftime("%Y%m%d"),
+            "rows": rows,
+            "stat_data": stat_data,
+        })
+        return rows
+
+    # 1ページ分のVALUEをschemaに合わせてParquetファイルとして書き込む
+    def _write_values(self, value_df: pd.DataFrame, values_dir: str, page: int, schema: pa.Schema):
+        unknown = [column for column in value_df.columns if column not in schema.names]
+        if unknown:
+            raise ValueError(f"VALUE has columns not in CLASS_INF: {unknown}")
+        # ページにない列は欠損値で補う
+        value_df = value_df.reindex(columns=schema.names)
+        # ページごとにカテゴリが異なると辞書型のスキーマが一致しないため、文字列として書き込む
+        # (Parquetファイル内では辞書エンコードされる)
+        value_df = value_df.astype({
+            column: object for column in value_df.columns if isinstance(value_df[column].dtype, pd.CategoricalDtype)})
+        table = pa.Table.from_pandas(value_df, schema=schema, preserve_index=False)
+        partition_cols = [PARTITION_COLUMN] if PARTITION_COLUMN in schema.names else None
+        pq.write_to_dataset(table, values_dir, partition_cols=partition_cols,
+                            basename_template=f"part-{page:05d}-{{i}}.parquet")
+
+    def read(self, stats_data_id: str, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+        """
+        保存したVALUEを読み込む
+        columns: 読み込む列。省略時は全列
+        filters: pyarrowの行の絞り込み条件 (例: [("@area", "==", "13000"), ("@time", ">=", "2015000000")])
+        @timeの条件はディレクトリ単位で、その他の列の条件はParquetの統計情報を使用して読み込み前に絞り込む
+        @で始まるコード列はcategory型、$列はFloat64型で返す
+        """
+        values_dir = self._get_values_dir(stats_data_id)
+        if not os.path.exists(values_dir):
+            raise FileNotFoundError(f"{stats_data_id} is not stored.")
+        # 書き込み時と同じスキーマで読み込み、ファイルごとの列の有無に関わらず全列を返す
+        dictionary_type = pa.dictionary(pa.int32(), pa.string())
+        schema = pa.schema([
+            pa.field(field.name, dictionary_type) if field.name.startswith("@") and field.name not in _VALUE_ATTR_COLUMNS else field
+            for field in _get_value_schema(self.get_meta(stats_data_id).get("stat_data", {}))])
+        partitioning = pa_dataset.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+        table = pq.read_table(values_dir, columns=columns, filters=filters, schema=schema, partitioning=partitioning)
+        return table.to_pandas(types_mapper={pa.float64(): pd.Float64Dtype()}.get)
+
+    def get_stat_data_object(self, stats_data_id: str, columns: list[str] | None = None, filters=None) -> JPEStatData:
+        """
+        保存した統計データをJPEStatDataとして返す
+        CLASS_INFを含むため、get_column_modified_values_df等も利用できる
+        """
+        meta = self.get_meta(stats_data_id)
+        value_df = self.read(stats_data_id, columns=columns, filters=filters)
+        return JPEStatData(stats_data_id=stats_data_id, stat_data=meta.get("stat_data", {}), value_df=value_df)
+
+    def remove(self, stats_data_id: str):
+        """
+        統計表をストアから削除する
+        """
+        shutil.rmtree(self._get_table_dir(stats_data_id), ignore_errors=True)
+
+    def sync(self, params: dict ={}, since: str | None = None) -> list[str]:
+        """
+        保存済みの統計表のうち、更新されたものだけを再取得する
+        統計表情報取得(getStatsList)にupdatedDate(前回同期日～今日)を指定して更新された統計表を調べ、
+        TABLE_INFのUPDATED_DATEが保存時と異なる統計表を取得し直す
+        params: 統計表情報取得の追加パラメータ (statsCode等で検索範囲を絞り込むと通信量が減る)
+        since: 検索する更新日付の開始日(yyyymmdd)。省略時は前回の同期日
+        戻り値: 再取得した統計表IDのリスト
+        """
+        client = self._get_client()
+        stored = {stats_data_id: self.get_meta(stats_data_id) for stats_data_id in self.list_stats_data_ids()}
+        if len(stored) == 0:
+            return []
+
+        state_path = os.path.join(self.root, "store.json")
+        state = self._read_json(state_path)
+        today = datetime.date.today().strftime("%Y%m%d")
+        if since is None:
+            since = state.get("last_sync") or min(meta.get("synced_at", today) for meta in stored.values())
+
+        list_params = dict(params)
+        list_params["updatedDate"] = f"{since}-{today}"
+        list_params.setdefault("explanationGetFlg", "N")
+        updated_dates: dict = {}
+        for stat_list in client.iter_stat_list_json(params=list_params):
+            for table_inf in _as_list(stat_list.get("GET_STATS_LIST",{}).get("DATALIST_INF",{}).get("TABLE_INF")):
+                if table_inf.get("@id") in stored:
+                    updated_dates[table_inf["@id"]] = table_inf.get("UPDATED_DATE")
+
+        changed = [
+            stats_data_id for stats_data_id, updated_date in updated_dates.items()
+            if updated_date is None or updated_date != stored[stats_data_id].get("updated_date")
+        ]
+        for stats_data_id in changed:
+            self.download(stats_data_id)
+
+        state["last_sync"] = today
+        self._write_json(state_path, state)
+        return changed
@@ -0,0 +1,22 @@
+from jpestat_client import JPEStatClient, JPEStatData, JPEStatListData, init_env
+if __name__ == "__main__":
+    import os
+
+    init_env()
+    app_id = os.getenv("JPESTAT_APP_ID", "")
+    if not app_id:
+        raise ValueError("JPESTAT_APP_ID is not set in the environment variables.")
+    client = JPEStatClient(app_id=app_id, lang="J")
+    params = {
+        "statsDataId": "0003448237",
+    }
+    # 
+    # 統計データをNEXT_KEYに従ってページ単位で取得し、CSVに追記
+    # 注釈(@annotation)等はページによって列の有無が異なるため、CLASS_INFから列を固定して各ページを揃える
+    # (全件をまとめて出力する場合は client.get_stat_data_all_value_df(params=params).to_csv(...) でよい)
+    columns = None
+    for i, data in enumerate(client.iter_stat_data_object(params=params)):
+        if columns is None:
+            columns = ["statsDataId"] + ["@" + class_id for class_id in data.get_class_info_df()["@id"]] + ["@unit", "$", "@annotation"]
+        df = data.get_value_df().reindex(columns=columns)
+        df.to_csv("stat_04.csv", index=False, encoding="utf-8", mode="w" if i == 0 else "a", header=(i == 0))
@@ -0,0 +1,19 @@
+from jpestat_client import JPEStatClient, init_env
+from jpestat_store import JPEStatStore
+if __name__ == "__main__":
+    import os
+
+    init_env()
+    app_id = os.getenv("JPESTAT_APP_ID", "")
+    if not app_id:
+        raise ValueError("JPESTAT_APP_ID is not set in the environment variables.")
+    client = JPEStatClient(app_id=app_id, lang="J")
+    store = JPEStatStore(root="jpestat_store", client=client)
+    # 
+    # 未保存の統計表は取得して保存し、保存済みの統計表は更新されたものだけ取得し直す
+    if "0004014855" not in store.list_stats_data_ids():
+        store.download("0004014855")
+    store.sync()
+    # 保存した統計データから東京都の2015年以降の値を読み込む
+    df = store.read("0004014855", filters=[("@area", "==", "13000"), ("@time", ">=", "2015000000")])
+    df.to_csv("stat_05.csv", index=False, encoding="utf-8")
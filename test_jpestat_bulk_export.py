@@ -0,0 +1,31 @@
+import json
+
+from jpestat_bulk_export import JPEStatBulkExporter, load_manifest
+
+def _write_manifest(path, entries: list[dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+def test_pending_jobs_after_params_change(tmp_path):
+    manifest_path = tmp_path / "manifest.jsonl"
+    entries = [
+        {"id": "tokyo", "statsDataId": "0000000001", "params": {"cdArea": "13000"}},
+        {"id": "osaka", "statsDataId": "0000000001", "params": {"cdArea": "27000"}},
+    ]
+    _write_manifest(manifest_path, entries)
+    exporter = JPEStatBulkExporter(None, str(tmp_path / "out"))
+    jobs = load_manifest(str(manifest_path))
+    assert exporter.get_pending_jobs(jobs) == jobs
+
+    # 完了を記録する (runの記録内容と同じ)
+    for job in jobs:
+        (tmp_path / "out" / f"{job['id']}.csv").write_text("", encoding="utf-8")
+        exporter._write_checkpoint({"id": job["id"], "statsDataId": job["statsDataId"],
+                                    "params_key": exporter._get_params_key(job)})
+    assert exporter.get_pending_jobs(load_manifest(str(manifest_path))) == []
+
+    # 明示したidのままparamsを変更した場合は再実行する
+    entries[1]["params"] = {"cdArea": "27100"}
+    _write_manifest(manifest_path, entries)
+    assert [job["id"] for job in exporter.get_pending_jobs(load_manifest(str(manifest_path)))] == ["osaka"]
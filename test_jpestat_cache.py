@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+import jpestat_cache
+from jpestat_cache import JPEStatCache, make_request_key
+
+_PARAMS = {"statsDataId": "0000000001"}
+
+def _stat_data(updated_date: str, value: str = "1") -> dict:
+    return {"GET_STATS_DATA": {"RESULT": {"STATUS": 0}, "STATISTICAL_DATA": {
+        "TABLE_INF": {"@id": "0000000001", "UPDATED_DATE": updated_date},
+        "DATA_INF": {"VALUE": [{"@area": "13000", "$": value}]}}}}
+
+# time.timeを置き換えて経過時間を操作する
+class _Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(jpestat_cache.time, "time", clock)
+    return clock
+
+def _get_accessed_at(cache: JPEStatCache, endpoint: str, params: dict) -> float:
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute("SELECT accessed_at FROM cache WHERE key = ?", (make_request_key(endpoint, params),)).fetchone()[0]
+
+def test_ttl(tmp_path, clock):
+    cache = JPEStatCache(path=str(tmp_path / "cache.sqlite3"), ttl={"getStatsData": 60})
+    assert cache.get("getStatsData", _PARAMS) == (None, False, None)
+    cache.put("getStatsData", _PARAMS, _stat_data("2020-01-01"))
+    clock.now += 59
+    data, fresh, updated_date = cache.get("getStatsData", _PARAMS)
+    assert fresh and updated_date == "2020-01-01" and data == _stat_data("2020-01-01")
+    # 有効期間を過ぎても再検証用に返す
+    clock.now += 2
+    data, fresh, updated_date = cache.get("getStatsData", _PARAMS)
+    assert not fresh and data == _stat_data("2020-01-01")
+    # touchで有効期間を延長する
+    cache.touch("getStatsData", _PARAMS)
+    assert cache.get("getStatsData", _PARAMS)[1]
+
+def test_access_update_is_debounced(tmp_path, clock):
+    cache = JPEStatCache(path=str(tmp_path / "cache.sqlite3"), ttl={"getStatsData": 1000}, access_update_ratio=0.1)
+    cache.put("getStatsData", _PARAMS, _stat_data("2020-01-01"))
+    created = clock.now
+    clock.now += 50
+    cache.get("getStatsData", _PARAMS)
+    assert _get_accessed_at(cache, "getStatsData", _PARAMS) == created
+    clock.now += 50
+    cache.get("getStatsData", _PARAMS)
+    assert _get_accessed_at(cache, "getStatsData", _PARAMS) == clock.now
+
+def test_evict_least_recently_used(tmp_path, clock):
+    data = {key: _stat_data("2020-01-01", value=key * 2000) for key in ("a", "b", "c")}
+    cache = JPEStatCache(path=str(tmp_path / "cache.sqlite3"), ttl={"getStatsData": 100}, access_update_ratio=0.1)
+    cache.put("getStatsData", {"statsDataId": "a"}, data["a"])
+    clock.now += 20
+    cache.put("getStatsData", {"statsDataId": "b"}, data["b"])
+    clock.now += 20
+    # aを参照して最終参照日時を更新する
+    cache.get("getStatsData", {"statsDataId": "a"})
+    # 2件分の大きさに制限してcを追加すると、参照の古いbを削除する
+    cache.max_size = cache.get_size()
+    clock.now += 20
+    cache.put("getStatsData", {"statsDataId": "c"}, data["c"])
+    assert cache.get("getStatsData", {"statsDataId": "b"})[0] is None
+    assert cache.get("getStatsData", {"statsDataId": "a"})[0] == data["a"]
+    assert cache.get("getStatsData", {"statsDataId": "c"})[0] == data["c"]
+
+def test_memory(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = JPEStatCache(path=path)
+    cache.put("getStatsData", _PARAMS, _stat_data("2020-01-01"))
+    first = cache.get("getStatsData", _PARAMS)[0]
+    assert cache.get("getStatsData", _PARAMS)[0] is first
+    # 他のプロセスで置き換えられた場合はSQLiteから読み込み直す
+    other = JPEStatCache(path=path)
+    clock.now += 1
+    other.put("getStatsData", _PARAMS, _stat_data("2020-02-01"))
+    assert cache.get("getStatsData", _PARAMS)[2] == "2020-02-01"
+    assert cache.get("getStatsData", _PARAMS)[0] == _stat_data("2020-02-01")
+    other.delete("getStatsData", _PARAMS)
+    assert cache.get("getStatsData", _PARAMS) == (None, False, None)
+
+    # memory_max_bodyを超えるレスポンスは保持しない
+    cache = JPEStatCache(path=path, memory_max_body=10)
+    cache.put("getStatsData", _PARAMS, _stat_data("2020-01-01"))
+    assert cache.get("getStatsData", _PARAMS)[0] is not cache.get("getStatsData", _PARAMS)[0]
+    # memory_entriesを超えた場合は参照の古い順に破棄する
+    cache = JPEStatCache(path=path, memory_entries=1)
+    cache.put("getStatsData", {"statsDataId": "a"}, _stat_data("2020-01-01"))
+    cache.put("getStatsData", {"statsDataId": "b"}, _stat_data("2020-01-01"))
+    assert list(cache._memory) == [make_request_key("getStatsData", {"statsDataId": "b"})]
@@ -0,0 +1,225 @@
+import io
+import json
+import os
+import time
+import urllib.parse
+
+import pytest
+import requests # type: ignore[import]
+from requests.adapters import BaseAdapter # type: ignore[import]
+from urllib3.response import HTTPResponse # type: ignore[import]
+
+from jpestat_cache import JPEStatCache
+from jpestat_client import JPEStatClient, _get_result_status, parse_simple_stat_data_csv
+
+# 記録したレスポンスのディレクトリ
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data")
+
+def _read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+        return f.read()
+
+# 記録したレスポンスを返すアダプタ
+class _FixtureAdapter(BaseAdapter):
+    """
+    <API名>.<statsDataId>.<startPosition>.json (getSimpleStatsDataは.csv) を返す
+    respondを指定した場合は(API名, パラメータ)からレスポンスを作成する
+    """
+    def __init__(self, respond=None):
+        super().__init__()
+        self.respond = respond
+        self.requests: list[tuple[str, dict]] = []
+
+    def send(self, request, **kwargs):
+        url = urllib.parse.urlparse(request.url)
+        endpoint = url.path.rsplit("/", 1)[-1]
+        params = dict(urllib.parse.parse_qsl(url.query))
+        self.requests.append((endpoint, params))
+        if self.respond is not None:
+            body = self.respond(endpoint, params)
+        else:
+            extension = "csv" if endpoint == "getSimpleStatsData" else "json"
+            body = _read_fixture(f"{endpoint}.{params['statsDataId']}.{params.get('startPosition', 1)}.{extension}")
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = HTTPResponse(body=io.BytesIO(body), preload_content=False)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+def _make_client(adapter: _FixtureAdapter, **kwargs) -> JPEStatClient:
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return JPEStatClient(app_id="test", session=session, **kwargs)
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_parse_simple_stat_data_csv(engine):
+    stat_data, value_df = parse_simple_stat_data_csv(_read_fixture("getSimpleStatsData.0000000001.1.csv"), engine=engine)
+    assert _get_result_status(stat_data) == 0
+    statistical_data = stat_data["GET_STATS_DATA"]["STATISTICAL_DATA"]
+    assert statistical_data["RESULT_INF"] == {"TOTAL_NUMBER": "3", "FROM_NUMBER": "1", "TO_NUMBER": "2", "NEXT_KEY": "3"}
+    assert statistical_data["TABLE_INF"]["@id"] == "0000000001"
+    assert statistical_data["TABLE_INF"]["STAT_NAME"] == {"@code": "00200524", "$": "人口推計"}
+    assert [class_obj["@id"] for class_obj in statistical_data["CLASS_INF"]["CLASS_OBJ"]] == ["tab", "area", "time"]
+    area = statistical_data["CLASS_INF"]["CLASS_OBJ"][1]
+    assert area["@name"] == "地域"
+    assert area["CLASS"] == [{"@code": "00000", "@name": "全国"}, {"@code": "13000", "@name": "東京都"}]
+    # コードの先頭の0を維持する
+    assert value_df["@area"].tolist() == ["00000", "13000"]
+    assert value_df["$"].tolist() == [126146.0, 14047.5]
+    # 空のannotation列は出力しない
+    assert "@annotation" not in value_df.columns
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_parse_simple_stat_data_csv_without_section_header(engine):
+    stat_data, value_df = parse_simple_stat_data_csv(_read_fixture("getSimpleStatsData.noheader.csv"), engine=engine,
+                                                     section_header=False)
+    assert stat_data["GET_STATS_DATA"]["RESULT"] == {}
+    assert value_df["@area"].tolist() == ["00000", "13000", "27000"]
+    assert value_df["@annotation"].tolist()[2] == "†"
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+@pytest.mark.parametrize("section_header", [True, False])
+def test_parse_simple_stat_data_csv_error(engine, section_header):
+    stat_data, value_df = parse_simple_stat_data_csv(_read_fixture("getSimpleStatsData.error.csv"), engine=engine,
+                                                     section_header=section_header)
+    # JSON形式と同様にRESULT、PARAMETERのみを返す
+    assert _get_result_status(stat_data) == 100
+    assert stat_data["GET_STATS_DATA"]["RESULT"]["ERROR_MSG"].startswith("認証に失敗しました")
+    assert stat_data["GET_STATS_DATA"]["PARAMETER"]["STATS_DATA_ID"] == "0000000001"
+    assert "STATISTICAL_DATA" not in stat_data["GET_STATS_DATA"]
+    assert len(value_df) == 0
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_parse_simple_stat_data_csv_no_data(engine):
+    stat_data, value_df = parse_simple_stat_data_csv(_read_fixture("getSimpleStatsData.nodata.csv"), engine=engine)
+    assert _get_result_status(stat_data) == 1
+    assert stat_data["GET_STATS_DATA"]["PARAMETER"]["CD_AREA"] == "99999"
+    assert len(value_df) == 0
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_get_stat_data_all_object_csv(engine):
+    adapter = _FixtureAdapter()
+    client = _make_client(adapter, csv_engine=engine)
+    stat_data_object = client.get_stat_data_all_object(params={"statsDataId": "0000000001", "limit": 2}, data_format="csv")
+    assert [params.get("startPosition") for _, params in adapter.requests] == [None, "3"]
+    assert all(params["sectionHeaderFlg"] == "1" for _, params in adapter.requests)
+
+    value_df = stat_data_object.get_value_df()
+    assert value_df["@area"].tolist() == ["00000", "13000", "27000"]
+    assert value_df["$"].isna().tolist() == [False, False, True]
+    assert value_df["@annotation"].tolist()[2] == "†"
+    # CLASS_INFは全ページ分を統合する
+    area = stat_data_object.get_column_info_df("area")
+    assert area["@code"].tolist() == ["00000", "13000", "27000"]
+    result_inf = stat_data_object.stat_data["GET_STATS_DATA"]["STATISTICAL_DATA"]["RESULT_INF"]
+    assert result_inf["TO_NUMBER"] == "3" and "NEXT_KEY" not in result_inf
+
+def test_get_stat_data_object_csv_error():
+    events = []
+    adapter = _FixtureAdapter(respond=lambda endpoint, params: _read_fixture("getSimpleStatsData.error.csv"))
+    client = _make_client(adapter, hooks=[events.append])
+    stat_data_object = client.get_stat_data_object(params={"statsDataId": "0000000001"}, data_format="csv")
+    assert _get_result_status(stat_data_object.stat_data) == 100
+    assert len(stat_data_object.get_value_df()) == 0
+    # 計測結果にもエラーのSTATUSを通知する
+    assert [event["result_status"] for event in events if event["event"] == "request"] == [100]
+
+    stat_data_object = client.get_stat_data_all_object(params={"statsDataId": "0000000001"}, data_format="csv")
+    assert _get_result_status(stat_data_object.stat_data) == 100
+
+@pytest.mark.parametrize("low_memory", [False, True], ids=["json", "low_memory"])
+def test_value_options(low_memory):
+    client = _make_client(_FixtureAdapter())
+    params = {"statsDataId": "0000000001"}
+    value_options = {"flag_special": True}
+    for stat_data_object in (client.get_stat_data_object(params=params, low_memory=low_memory, value_options=value_options),
+                             client.get_stat_data_all_object(params=params, low_memory=low_memory, value_options=value_options),
+                             next(client.iter_stat_data_object(params=params, low_memory=low_memory, value_options=value_options))):
+        assert stat_data_object.value_options == {"numeric": True, "categorical": True, "flag_special": True}
+        df = stat_data_object.get_column_modified_values_df()
+        assert df["特殊文字"].tolist()[2] == "-"
+        stat_data_object.release_raw()
+        assert "$special" in stat_data_object.get_value_df(flag_special=True).columns
+
+# 地域4件 × 時間軸3件の統計表のレスポンスを作成する (cdArea、cdTime、startPosition、limit、cntGetFlgに対応)
+def _respond_sliced(endpoint: str, params: dict) -> bytes:
+    areas = ["13000", "14000", "27000", "28000"]
+    times = ["2020000000", "2021000000", "2022000000"]
+    class_inf = {"CLASS_OBJ": [
+        {"@id": "area", "@name": "地域", "CLASS": [{"@code": code, "@name": code} for code in areas]},
+        {"@id": "time", "@name": "時間軸", "CLASS": [{"@code": code, "@name": code} for code in times]},
+    ]}
+    result = {"STATUS": 0, "ERROR_MSG": "正常に終了しました。"}
+    if endpoint == "getMetaInfo":
+        return json.dumps({"GET_META_INFO": {"RESULT": result, "METADATA_INF": {"CLASS_INF": class_inf}}}).encode("utf-8")
+    areas = params["cdArea"].split(",") if "cdArea" in params else areas
+    times = params["cdTime"].split(",") if "cdTime" in params else times
+    values = [{"@area": area, "@time": time, "$": "-" if area == "27000" else str(int(area) + int(time[:4]))}
+              for area in areas for time in times]
+    start, limit = int(params.get("startPosition", 1)), int(params.get("limit", 100_000))
+    result_inf = {"TOTAL_NUMBER": len(values), "FROM_NUMBER": start, "TO_NUMBER": min(len(values), start + limit - 1)}
+    if start + limit <= len(values):
+        result_inf["NEXT_KEY"] = start + limit
+    statistical_data: dict = {"RESULT_INF": result_inf}
+    if params.get("cntGetFlg") != "Y":
+        statistical_data["CLASS_INF"] = class_inf
+        statistical_data["DATA_INF"] = {"VALUE": values[start - 1:start - 1 + limit]}
+    return json.dumps({"GET_STATS_DATA": {"RESULT": result, "STATISTICAL_DATA": statistical_data}}).encode("utf-8")
+
+@pytest.mark.parametrize("low_memory", [False, True], ids=["json", "low_memory"])
+def test_get_stat_data_parallel_object(low_memory):
+    adapter = _FixtureAdapter(respond=_respond_sliced)
+    client = _make_client(adapter)
+    params = {"statsDataId": "0000000001", "startPosition": 3, "cntGetFlg": "N"}
+    stat_data_object = client.get_stat_data_parallel_object(params=params, max_rows=3, low_memory=low_memory,
+                                                            value_options={"flag_special": True})
+    # startPositionは分割したパラメータに引き継がず、全件を取得する
+    slices = [params for endpoint, params in adapter.requests if endpoint == "getStatsData" and "cntGetFlg" not in params]
+    assert len(slices) == 4 and all("startPosition" not in params for params in slices)
+    value_df = stat_data_object.get_value_df(flag_special=True)
+    assert len(value_df) == 12
+    assert value_df["$special"].notna().sum() == 3
+    assert stat_data_object.get_column_modified_values_df()["特殊文字"].notna().sum() == 3
+
+def test_cache_revalidation(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    updated_date = ["2020-01-01"]
+
+    def respond(endpoint: str, params: dict) -> bytes:
+        statistical_data: dict = {"TABLE_INF": {"@id": params["statsDataId"], "UPDATED_DATE": updated_date[0]}}
+        if params.get("cntGetFlg") != "Y":
+            statistical_data["DATA_INF"] = {"VALUE": [{"@area": "13000", "$": updated_date[0]}]}
+        return json.dumps({"GET_STATS_DATA": {"RESULT": {"STATUS": 0}, "STATISTICAL_DATA": statistical_data}}).encode("utf-8")
+
+    events = []
+    adapter = _FixtureAdapter(respond=respond)
+    cache = JPEStatCache(path=str(tmp_path / "cache.sqlite3"), ttl={"getStatsData": 60})
+    client = _make_client(adapter, cache=cache, hooks=[events.append])
+    params = {"statsDataId": "0000000001"}
+
+    def fetch() -> tuple[str, str]:
+        del events[:]
+        del adapter.requests[:]
+        data = client.get_stat_data_json(params=params)
+        result = [event["result"] for event in events if event["event"] == "cache"][0]
+        return result, data["GET_STATS_DATA"]["STATISTICAL_DATA"]["DATA_INF"]["VALUE"][0]["$"]
+
+    assert fetch() == ("miss", "2020-01-01")
+    now[0] += 30
+    assert fetch() == ("hit", "2020-01-01") and adapter.requests == []
+    # 有効期間を過ぎても、更新日付が変わっていなければ件数のみの取得で再利用する
+    now[0] += 31
+    assert fetch() == ("revalidated", "2020-01-01")
+    assert [params.get("cntGetFlg") for _, params in adapter.requests] == ["Y"]
+    now[0] += 30
+    assert fetch() == ("hit", "2020-01-01")
+    # 更新された場合は取得し直す
+    now[0] += 31
+    updated_date[0] = "2020-02-01"
+    assert fetch() == ("miss", "2020-02-01")
+    assert [params.get("cntGetFlg") for _, params in adapter.requests] == ["Y", None]
@@ -0,0 +1,40 @@
+import threading
+import time
+
+import pytest
+
+from jpestat_ratelimit import JPEStatRateLimiter
+
+# 多数のスレッドが同時にトークンを取得しても、設定したレートを超えないことを確認する
+def _run_contention(limiter: JPEStatRateLimiter, threads: int = 16, duration: float = 2.0) -> tuple[int, float]:
+    count = 0
+    count_lock = threading.Lock()
+    start = time.time()
+    deadline = start + duration
+
+    def worker():
+        nonlocal count
+        while True:
+            limiter.acquire()
+            if time.time() >= deadline:
+                return
+            with count_lock:
+                count += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return count, duration
+
+@pytest.mark.parametrize("shared", [False, True], ids=["in_process", "sqlite"])
+def test_rate_under_contention(tmp_path, shared):
+    rate, burst = 20.0, 1
+    path = str(tmp_path / "bucket.sqlite3") if shared else None
+    limiter = JPEStatRateLimiter(rate=rate, burst=burst, path=path)
+    count, duration = _run_contention(limiter)
+    # 上限はburst + rate * 経過時間。スケジューリングの誤差として1件だけ許容する
+    assert count <= burst + rate * duration + 1
+    # 制限が厳しすぎないこと
+    assert count >= rate * duration * 0.8
@@ -0,0 +1,49 @@
+import pandas as pd # type: ignore[import]
+
+from jpestat_client import JPEStatData, decode_value_list
+from jpestat_store import JPEStatStore
+
+_STAT_DATA = {"GET_STATS_DATA": {"STATISTICAL_DATA": {
+    "TABLE_INF": {"@id": "0000000001", "UPDATED_DATE": "2020-01-01"},
+    "CLASS_INF": {"CLASS_OBJ": [
+        {"@id": "tab", "CLASS": {"@code": "001"}},
+        {"@id": "area", "CLASS": [{"@code": "13000"}, {"@code": "27000"}]},
+        {"@id": "time", "CLASS": [{"@code": "2020000000"}, {"@code": "2021000000"}]},
+    ]},
+}}}
+
+# ページごとにJPEStatDataを返すクライアント
+class _PagedClient:
+    def __init__(self, pages: list[list[dict]]):
+        self.pages = pages
+
+    def iter_stat_data_object(self, params: dict ={}, low_memory: bool = False):
+        for values in self.pages:
+            yield JPEStatData(stats_data_id=params["statsDataId"], stat_data=_STAT_DATA, value_df=decode_value_list(values))
+
+def test_read_pages_with_different_dtypes(tmp_path):
+    pages = [
+        # 先頭ページの$は整数のみ、@annotationなし
+        [{"@tab": "001", "@area": "13000", "@time": "2020000000", "@unit": "人", "$": "10"},
+         {"@tab": "001", "@area": "27000", "@time": "2020000000", "@unit": "人", "$": "20"}],
+        # 次のページの$は小数を含み、一部の行にのみ@annotationがある
+        [{"@tab": "001", "@area": "13000", "@time": "2021000000", "@unit": "人", "$": "1.5"},
+         {"@tab": "001", "@area": "27000", "@time": "2021000000", "@unit": "人", "$": "-", "@annotation": "†"}],
+    ]
+    assert decode_value_list(pages[0])["$"].dtype == "Int64"
+    assert decode_value_list(pages[1])["$"].dtype == "Float64"
+
+    store = JPEStatStore(root=str(tmp_path), client=_PagedClient(pages))
+    assert store.download("0000000001") == 4
+
+    df = store.read("0000000001").sort_values(["@time", "@area"]).reset_index(drop=True)
+    assert list(df.columns) == ["@tab", "@area", "@time", "@unit", "$", "@annotation"]
+    assert df["$"].dtype == "Float64"
+    assert df["$"].tolist()[:3] == [10.0, 20.0, 1.5]
+    assert pd.isna(df["$"][3])
+    assert df["@annotation"].isna().tolist() == [True, True, True, False]
+    assert df["@annotation"][3] == "†"
+    assert isinstance(df["@area"].dtype, pd.CategoricalDtype)
+
+    df = store.read("0000000001", columns=["@area", "$"], filters=[("$", ">", 15.0)])
+    assert df["@area"].tolist() == ["27000"]